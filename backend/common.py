@@ -0,0 +1,267 @@
+"""
+PrivacyLens Backend - Shared API Code
+=====================================
+
+Pieces used unchanged by both apps, so their behaviour can't drift apart:
+- main.py (YOLO detection + blurring)
+- main_hardcoded.py (real frames, mock detection)
+
+Storage directories, API models, upload limits and saving, upload
+filename sanitizing, protected video streaming (Range + conditional requests)
+and file cleanup for dropped videos.
+"""
+
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import ORJSONResponse, FileResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from typing import Callable, List, Optional
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+import os
+import re
+import time
+import logging
+import aiofiles
+
+logger = logging.getLogger(__name__)
+
+# Create directories for file storage
+UPLOAD_DIR = Path("uploads")
+PROCESSED_DIR = Path("processed")
+FRAMES_DIR = Path("frames")
+UPLOAD_DIR.mkdir(exist_ok=True)
+PROCESSED_DIR.mkdir(exist_ok=True)
+FRAMES_DIR.mkdir(exist_ok=True)
+
+# Uploads are copied to disk in pieces of this size
+UPLOAD_CHUNK_BYTES = 1 << 20  # 1 MiB
+
+# Largest accepted upload; keep the proxy's client_max_body_size in line with it
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(500 * 1024 * 1024)))  # 500 MiB
+
+# Range responses are streamed from disk in pieces of this size
+STREAM_CHUNK_BYTES = 256 * 1024  # 256 KiB per read
+# Single byte range, e.g. "bytes=0-1023", "bytes=1024-" or the suffix form "bytes=-500"
+RANGE_HEADER_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Pydantic models for API
+class PIIDetection(BaseModel):
+    type: str  # 'credit_card', 'car_plate' etc
+    confidence: float
+    description: str
+    severity: str  # 'low', 'medium', 'high'
+
+class PIIFrame(BaseModel):
+    id: str
+    frameUri: str  # URL to frame/crop image
+    timestamp: float
+    detections: List[PIIDetection]
+
+class VideoUploadResponse(BaseModel):
+    videoId: str
+    piiFrames: List[PIIFrame]
+    totalFramesAnalyzed: int
+    processingTime: int
+
+class ProtectionRequest(BaseModel):
+    videoId: str
+    piiFrames: List[PIIFrame]
+
+class ProtectionResponse(BaseModel):
+    protectedVideoUri: str
+
+async def reject_oversized_uploads(request: Request, call_next):
+    """
+    Answer 413 from the declared Content-Length before the multipart body is
+    read, so an oversized upload never reaches the spool file or UPLOAD_DIR
+    """
+    content_length = request.headers.get("content-length")
+    if request.method == "POST" and content_length and content_length.isdigit():
+        if int(content_length) > MAX_UPLOAD_BYTES:
+            return ORJSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds {MAX_UPLOAD_BYTES} bytes"},
+            )
+    return await call_next(request)
+
+def safe_filename(name: Optional[str]) -> str:
+    """Client filename reduced to [A-Za-z0-9._-] so it can't escape UPLOAD_DIR"""
+    name = re.sub(r'[^A-Za-z0-9._-]', '_', Path(name or "video").name)
+    return name.lstrip('.') or "video"
+
+async def save_upload(video: UploadFile, video_id: str) -> Path:
+    """Save an uploaded video to UPLOAD_DIR as {video_id}_{safe name}, returning its path"""
+    file_path = UPLOAD_DIR / f"{video_id}_{safe_filename(video.filename)}"
+    try:
+        # Async chunked copy: memory stays flat and the event loop keeps serving.
+        # Content-Length is client-controlled, so the size is also counted here.
+        written = 0
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await video.read(UPLOAD_CHUNK_BYTES):
+                written += len(chunk)
+                if written > MAX_UPLOAD_BYTES:
+                    break
+                await buffer.write(chunk)
+    except Exception as e:
+        file_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=500, detail=f"Failed to save video: {str(e)}")
+    
+    if written > MAX_UPLOAD_BYTES:
+        file_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+    
+    logger.info("📹 Saved video: %s (%.1f MiB)", file_path, written / (1 << 20))
+    return file_path
+
+async def iter_file_range(path: Path, start: int, length: int):
+    """Yield `length` bytes of `path` from `start` in STREAM_CHUNK_BYTES pieces"""
+    async with aiofiles.open(path, "rb") as video_file:
+        if hasattr(os, "posix_fadvise"):  # Linux/BSD: widen readahead for the sequential read
+            os.posix_fadvise(video_file.fileno(), start, length, os.POSIX_FADV_SEQUENTIAL)
+        await video_file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await video_file.read(min(STREAM_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the current file"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    
+    return False
+
+def video_file_response(video_path: Path, request: Request) -> Response:
+    """
+    🎥 Serve a video file with HTTP Range and conditional request support
+    
+    - 304 when If-None-Match / If-Modified-Since still match
+    - Whole file (or "bytes=0-") through FileResponse
+    - Partial ranges streamed in STREAM_CHUNK_BYTES pieces
+    - CORS headers for React Native
+    """
+    # Get file stats
+    file_stat = video_path.stat()
+    file_size = file_stat.st_size
+    
+    # Validators so players can revalidate instead of re-downloading
+    etag = f'"{file_stat.st_mtime_ns:x}-{file_size:x}"'
+    last_modified = formatdate(file_stat.st_mtime, usegmt=True)
+    validator_headers = {"ETag": etag, "Last-Modified": last_modified}
+    
+    if is_not_modified(request, etag, file_stat.st_mtime):
+        return Response(status_code=304, headers={
+            **validator_headers,
+            "Cache-Control": "no-cache",
+            "Access-Control-Allow-Origin": "*",
+        })
+    
+    # Handle range requests for video streaming
+    range_header = request.headers.get("Range")
+    
+    if range_header:
+        # Parse range header; malformed or multi-range headers get the whole file
+        range_match = RANGE_HEADER_PATTERN.match(range_header.strip())
+        first, last = range_match.groups() if range_match else ("", "")
+        if first:
+            start = int(first)
+            end = min(int(last), file_size - 1) if last else file_size - 1
+        elif last:  # Suffix range: the final `last` bytes
+            start = max(0, file_size - int(last))
+            end = file_size - 1
+        else:
+            start, end = 0, file_size - 1
+        
+        if start > end:
+            return Response(status_code=416, headers={
+                "Content-Range": f"bytes */{file_size}",
+                "Access-Control-Allow-Origin": "*",
+            })
+            
+        chunk_size = end - start + 1
+            
+        headers = {
+            "Content-Range": f"bytes {start}-{end}/{file_size}",
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(chunk_size),
+            "Content-Type": "video/mp4",
+            "Cache-Control": "no-cache",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "Range, Content-Type",
+            **validator_headers,
+        }
+        
+        # Whole-file range (e.g. "bytes=0-"): hand the file to FileResponse so the
+        # server's file-send path is used instead of copying through Python
+        if start == 0 and end == file_size - 1:
+            return FileResponse(video_path, status_code=206, headers=headers, stat_result=file_stat)
+        
+        # Partial range: stream fixed-size pieces, never one read(chunk_size) allocation
+        return StreamingResponse(
+            iter_file_range(video_path, start, chunk_size),
+            status_code=206,
+            headers=headers,
+        )
+    
+    else:
+        # No range request, serve entire file
+        return FileResponse(
+            video_path,
+            media_type="video/mp4", 
+            headers={
+                "Accept-Ranges": "bytes",
+                "Content-Type": "video/mp4",
+                "Cache-Control": "no-cache",
+                "Access-Control-Allow-Origin": "*",
+                "Content-Length": str(file_size),
+                **validator_headers,
+            },
+            stat_result=file_stat
+        )
+
+def delete_video_files(video_id: str, info: dict) -> None:
+    """Remove the upload, detections, protected output and frame images of a dropped video"""
+    for key in ("original_path", "detections_path", "protected_path"):
+        if info.get(key):
+            Path(info[key]).unlink(missing_ok=True)
+    for frame_path in FRAMES_DIR.glob(f"{video_id}_*"):
+        frame_path.unlink(missing_ok=True)
+
+VIDEO_ID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+def sweep_orphaned_files(is_live: Callable[[str], bool], max_age_seconds: float) -> int:
+    """
+    Delete files in the storage dirs that no live video owns, returning the count
+    
+    Catches what entry-based cleanup can't: uploads whose analysis crashed
+    before they were stored, files left over from a restart. A file goes once
+    it is older than max_age_seconds and the video_id in its name (if any)
+    fails is_live, so files of videos still in storage are never touched.
+    """
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for directory in (UPLOAD_DIR, PROCESSED_DIR, FRAMES_DIR):
+        for path in directory.iterdir():
+            try:
+                if not path.is_file() or path.stat().st_mtime > cutoff:
+                    continue
+                match = VIDEO_ID_PATTERN.search(path.name)
+                if match and is_live(match.group(0)):
+                    continue
+                path.unlink(missing_ok=True)
+                removed += 1
+            except OSError:
+                continue  # Removed or replaced concurrently
+    return removed
@@ -23,117 +23,217 @@ KEY FEATURES:
 ✅ Render deployment ready
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import uuid
 import time
 import asyncio
+import functools
 import os
-import shutil
 import logging
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from PIL import Image
 import cv2
 import numpy as np
 
 # Import our pipeline modules
-from pipeline.detect import detect_video
-from pipeline.extract import process_video
-from pipeline.blur import blur_video
+from pipeline.detect import detect_video, save_detections, load_detections
+from pipeline.extract import process_video, CROP_JPEG_PARAMS
+from pipeline.blur import blur_video, warmup_blur_kernels
+
+# Storage dirs, API models, upload limits and video streaming shared with main_hardcoded.py
+from common import (
+    PROCESSED_DIR, FRAMES_DIR,
+    VideoUploadResponse, ProtectionRequest, ProtectionResponse,
+    reject_oversized_uploads, save_upload, video_file_response, delete_video_files,
+    sweep_orphaned_files,
+)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
 # Get base URL from environment or default to localhost for development  
 BASE_URL = os.environ.get("BASE_URL", "http://localhost:8000")
+# Where frame images are fetched from: a CDN or nginx/Caddy serving FRAMES_DIR
+# directly (e.g. `location /frames/ { root /app; sendfile on; }`) in production
+FRAMES_BASE_URL = os.environ.get("FRAMES_BASE_URL", f"{BASE_URL}/frames").rstrip("/")
+# Set to "0" when that server handles /frames so uvicorn doesn't mount it
+SERVE_STATIC_FRAMES = os.environ.get("SERVE_STATIC_FRAMES", "1") != "0"
 MODEL_PATH = "models/Credit.pt"
+# Ultralytics dataset YAML of representative frames; when set the engine is INT8-calibrated on it
+TRT_INT8_DATA = os.environ.get("TRT_INT8_DATA", "")
+# TensorRT build of MODEL_PATH (INT8 and FP16 builds are cached under different names)
+ENGINE_PATH = str(Path(MODEL_PATH).with_suffix(".int8.engine" if TRT_INT8_DATA else ".engine"))
+DETECT_BATCH_SIZE = int(os.environ.get("DETECT_BATCH_SIZE", "4"))  # Frames per YOLO call (engine allows up to 16)
+# torch.compile mode for the PyTorch weights ("" = off); unused when the TensorRT engine loads
+TORCH_COMPILE_MODE = os.environ.get("TORCH_COMPILE_MODE", "")
 
-# Create directories for file storage
-UPLOAD_DIR = Path("uploads")
-PROCESSED_DIR = Path("processed") 
-FRAMES_DIR = Path("frames")
-UPLOAD_DIR.mkdir(exist_ok=True)
-PROCESSED_DIR.mkdir(exist_ok=True)
-FRAMES_DIR.mkdir(exist_ok=True)
+# Dedicated pool for model inference and blurring, sized to GPU parallelism (1-2 for
+# one GPU) so concurrent requests queue here instead of contending for the CUDA context.
+# Light work (track extraction, file I/O) keeps using asyncio.to_thread.
+GPU_WORKERS = int(os.environ.get("GPU_WORKERS", "1"))
+gpu_executor = ThreadPoolExecutor(max_workers=GPU_WORKERS, thread_name_prefix="gpu")
+
+# Track crops are JPEG-encoded and written in parallel (cv2.imencode and file writes
+# release the GIL), instead of one after another
+CROP_WORKERS = int(os.environ.get("CROP_WORKERS", "4"))
+crop_executor = ThreadPoolExecutor(max_workers=CROP_WORKERS, thread_name_prefix="crop")
+
+async def run_on_gpu_executor(fn, *args, **kwargs):
+    """Await fn(*args, **kwargs) on gpu_executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(gpu_executor, functools.partial(fn, *args, **kwargs))
 
 # Global model instance (preloaded at startup)
 yolo_model = None
+yolo_model_path = MODEL_PATH  # Weights actually in use (.pt or TensorRT .engine)
+yolo_device = "cpu"  # Inference device; 0 (first CUDA GPU) when one is available
+
+def cuda_available() -> bool:
+    """True when PyTorch can see a CUDA GPU"""
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+def export_tensorrt_engine() -> Optional[str]:
+    """
+    ⚡ Build a TensorRT FP16 engine from MODEL_PATH (cached next to the .pt,
+    rebuilt only when the .pt is newer), or an INT8 one calibrated on
+    TRT_INT8_DATA when that is set
+    Returns the engine path, or None when no CUDA GPU / TensorRT is available
+    """
+    if not cuda_available():
+        return None
+    try:
+        import tensorrt  # noqa: F401
+    except ImportError:
+        return None
+    
+    # Reuse the cached engine unless the .pt weights were replaced after it was built
+    if os.path.exists(ENGINE_PATH) and os.path.getmtime(ENGINE_PATH) >= os.path.getmtime(MODEL_PATH):
+        return ENGINE_PATH
+    
+    try:
+        precision = "INT8" if TRT_INT8_DATA else "FP16"
+        logger.info("⚙️  Exporting TensorRT %s engine to %s (one-time)...", precision, ENGINE_PATH)
+        from ultralytics import YOLO
+        if TRT_INT8_DATA:
+            quantization = {"int8": True, "data": TRT_INT8_DATA}
+        else:
+            quantization = {"half": True}
+        # Ultralytics always writes <stem>.engine, so an INT8 build exported from
+        # MODEL_PATH would overwrite the cached FP16 Credit.engine first. Export it
+        # from a copy whose stem already matches ENGINE_PATH (Credit.int8.pt) instead
+        source_path = str(Path(ENGINE_PATH).with_suffix(".pt")) if TRT_INT8_DATA else MODEL_PATH
+        if source_path != MODEL_PATH:
+            shutil.copy2(MODEL_PATH, source_path)
+        try:
+            YOLO(source_path).export(
+                format="engine", imgsz=640, device=0, dynamic=True, batch=16, **quantization
+            )
+        finally:
+            if source_path != MODEL_PATH:
+                Path(source_path).unlink(missing_ok=True)
+        return ENGINE_PATH
+    except Exception as e:
+        logger.warning("⚠️  TensorRT export failed, using PyTorch weights: %s", e)
+        return None
+
+def compile_yolo_model(model) -> None:
+    """
+    ⚡ torch.compile the network behind a warmed-up .pt YOLO model
+    Fuses conv/BN/activation kernels; failures keep the eager model
+    """
+    try:
+        import torch
+        backend = model.predictor.model  # AutoBackend, created by the warm-up call
+        backend.model = torch.compile(backend.model, mode=TORCH_COMPILE_MODE, fullgraph=False)
+        logger.info("⚙️  Compiled YOLO model with torch.compile (mode=%s)", TORCH_COMPILE_MODE)
+    except Exception as e:
+        logger.warning("⚠️  torch.compile failed, using eager model: %s", e)
 
 def load_yolo_model():
     """
     🚀 CRITICAL: Load YOLO model at startup for performance
     This prevents loading the model on every request
+    
+    On CUDA hosts with TensorRT the FP16 engine is used instead of the .pt
+    weights, and a dummy inference warms the model up before the first request.
+    Without the engine, TORCH_COMPILE_MODE (e.g. "reduce-overhead") compiles the
+    .pt network.
     """
-    global yolo_model
+    global yolo_model, yolo_model_path, yolo_device
     try:
         if os.path.exists(MODEL_PATH):
-            logger.info(f"🤖 Loading YOLO model from {MODEL_PATH}...")
+            yolo_device = 0 if cuda_available() else "cpu"
+            yolo_model_path = export_tensorrt_engine() or MODEL_PATH
+            logger.info("🤖 Loading YOLO model from %s on device %s...", yolo_model_path, yolo_device)
             from ultralytics import YOLO
-            yolo_model = YOLO(MODEL_PATH)
+            yolo_model = YOLO(yolo_model_path, task="detect")
+            yolo_model(np.zeros((640, 640, 3), dtype=np.uint8), device=yolo_device, verbose=False)  # Warm-up
+            if TORCH_COMPILE_MODE and yolo_model_path == MODEL_PATH:
+                compile_yolo_model(yolo_model)
+                # Pay the compile cost here rather than on the first upload
+                yolo_model(np.zeros((640, 640, 3), dtype=np.uint8), device=yolo_device, verbose=False)
             logger.info("✅ YOLO model loaded successfully!")
             return True
         else:
-            logger.error(f"❌ Model file not found: {MODEL_PATH}")
+            logger.error("❌ Model file not found: %s", MODEL_PATH)
             return False
     except Exception as e:
-        logger.error(f"❌ Failed to load YOLO model: {e}")
+        logger.error("❌ Failed to load YOLO model: %s", e)
         return False
 
-def get_video_info(video_path: str) -> dict:
-    """Extract basic video information"""
-    try:
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = frame_count / fps if fps > 0 else 0
-        cap.release()
-        
-        return {
-            "fps": fps,
-            "frame_count": frame_count,
-            "duration": duration
-        }
-    except Exception as e:
-        logger.error(f"Error getting video info: {e}")
-        return {"fps": 30, "frame_count": 0, "duration": 0}
-
-def create_frame_image_from_crop(crop_path: str, frame_id: str) -> str:
+def create_frame_image_from_crop(crop: Optional[np.ndarray], frame_id: str) -> str:
     """
-    Convert YOLO crop to frame image for frontend display
+    Encode a YOLO crop straight to the frame image served to the frontend
     """
     try:
-        if crop_path and os.path.exists(crop_path):
-            # Copy crop to frames directory with expected naming
+        if crop is not None and crop.size > 0:
+            ok, buffer = cv2.imencode(".jpg", crop, CROP_JPEG_PARAMS)
+            if not ok:
+                raise ValueError(f"Could not encode crop for {frame_id}")
             frame_filename = f"{frame_id}.jpg"
-            frame_path = FRAMES_DIR / frame_filename
-            shutil.copy2(crop_path, frame_path)
-            return f"{BASE_URL}/frames/{frame_filename}"
+            (FRAMES_DIR / frame_filename).write_bytes(buffer.tobytes())
+            return f"{FRAMES_BASE_URL}/{frame_filename}"
         else:
-            # Create fallback frame if crop doesn't exist
+            # Create fallback frame if there is no crop
             return create_fallback_frame_image(frame_id)
     except Exception as e:
-        logger.error(f"Error creating frame image: {e}")
+        logger.error("Error creating frame image: %s", e)
         return create_fallback_frame_image(frame_id)
 
+@functools.lru_cache(maxsize=1)
+def fallback_frame_jpeg() -> bytes:
+    """The fallback image is the same for every frame, so it is encoded only once"""
+    width, height = 640, 360
+    img = np.full((height, width, 3), (230, 216, 173), dtype=np.uint8)  # light blue (BGR)
+    ok, buffer = cv2.imencode(".jpg", img, CROP_JPEG_PARAMS)
+    if not ok:
+        raise ValueError("Could not encode fallback frame")
+    return buffer.tobytes()
+
 def create_fallback_frame_image(frame_id: str) -> str:
     """Create fallback frame image if crop processing fails"""
     try:
-        width, height = 640, 360
-        img = Image.new('RGB', (width, height), color='lightblue')
         frame_path = FRAMES_DIR / f"{frame_id}.jpg" 
-        img.save(frame_path)
-        return f"{BASE_URL}/frames/{frame_id}.jpg"
+        frame_path.write_bytes(fallback_frame_jpeg())
+        return f"{FRAMES_BASE_URL}/{frame_id}.jpg"
     except Exception as e:
-        logger.error(f"Error creating fallback frame: {e}")
+        logger.error("Error creating fallback frame: %s", e)
         return ""
 
 # Initialize FastAPI app
-app = FastAPI(title="PrivacyLens API", version="2.0.0")
+app = FastAPI(title="PrivacyLens API", version="2.0.0", default_response_class=ORJSONResponse)
 
 # CORS middleware for frontend integration
 app.add_middleware(
@@ -144,8 +244,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Serve frame images
-app.mount("/frames", StaticFiles(directory="frames"), name="frames")
+# Serve frame images (development; production can hand /frames to the proxy/CDN)
+if SERVE_STATIC_FRAMES:
+    app.mount("/frames", StaticFiles(directory="frames"), name="frames")
+
+# 413 for oversized uploads before their body is read
+app.middleware("http")(reject_oversized_uploads)
 
 @app.on_event("startup")
 async def startup_event():
@@ -154,88 +258,117 @@ async def startup_event():
     success = load_yolo_model()
     if not success:
         logger.warning("⚠️  YOLO model not loaded - check model path")
+    warmup_blur_kernels()
+    app.state.purge_task = asyncio.create_task(purge_expired_videos())
     logger.info("✅ Backend startup complete")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the expired-video cleanup task and the worker pools"""
+    app.state.purge_task.cancel()
+    gpu_executor.shutdown(wait=False, cancel_futures=True)
+    crop_executor.shutdown(wait=False, cancel_futures=True)
+
 @app.get("/protected/{filename}")
 async def stream_protected_video(filename: str, request: Request):
     """
     🎥 Stream protected videos with HTTP range support for React Native
+    
+    Range, conditional (304) and CORS handling is shared with main_hardcoded.py
+    through common.video_file_response().
     """
     video_path = PROCESSED_DIR / filename
     
     if not video_path.exists():
         raise HTTPException(status_code=404, detail="Protected video not found")
     
-    file_size = video_path.stat().st_size
-    range_header = request.headers.get("Range")
+    return video_file_response(video_path, request)
+
+class VideoStore:
+    """
+    In-memory video_storage bounded by entry count and age
     
-    if range_header:
-        try:
-            range_match = range_header.replace("bytes=", "")
-            start, end = range_match.split("-")
-            start = int(start) if start else 0
-            end = int(end) if end else file_size - 1
-            end = min(end, file_size - 1)
-        except:
-            start, end = 0, file_size - 1
-            
-        with open(video_path, "rb") as video_file:
-            video_file.seek(start)
-            chunk_size = end - start + 1
-            chunk = video_file.read(chunk_size)
-            
-        headers = {
-            "Content-Range": f"bytes {start}-{end}/{file_size}",
-            "Accept-Ranges": "bytes", 
-            "Content-Length": str(chunk_size),
-            "Content-Type": "video/mp4",
-            "Cache-Control": "no-cache",
-            "Access-Control-Allow-Origin": "*",
-        }
-        
-        return Response(chunk, status_code=206, headers=headers)
+    Entries are small (paths, PII frames; detections live in .npz files) and
+    stay in process. They expire ttl_seconds after their last write,
+    and set() evicts the least recently used entry beyond max_videos. Dropped
+    entries are returned so their files can be deleted.
+    """
     
-    else:
-        return FileResponse(
-            video_path,
-            media_type="video/mp4",
-            headers={
-                "Accept-Ranges": "bytes",
-                "Content-Type": "video/mp4", 
-                "Cache-Control": "no-cache",
-                "Access-Control-Allow-Origin": "*",
-                "Content-Length": str(file_size)
-            }
-        )
-
-# Pydantic models for API
-class PIIDetection(BaseModel):
-    type: str  # 'credit_card', 'car_plate' etc
-    confidence: float
-    description: str
-    severity: str  # 'low', 'medium', 'high'
-
-class PIIFrame(BaseModel):
-    id: str
-    frameUri: str  # URL to frame/crop image
-    timestamp: float
-    detections: List[PIIDetection]
-
-class VideoUploadResponse(BaseModel):
-    videoId: str
-    piiFrames: List[PIIFrame]
-    totalFramesAnalyzed: int
-    processingTime: int
-
-class ProtectionRequest(BaseModel):
-    videoId: str
-    piiFrames: List[PIIFrame]
+    def __init__(self, max_videos: int, ttl_seconds: int):
+        self.max_videos = max_videos
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()  # video_id -> (expires_at, info)
+        self._lock = threading.Lock()
+    
+    def get(self, video_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None or entry[0] <= time.time():
+                return None
+            self._entries.move_to_end(video_id)
+            return entry[1]
+    
+    def set(self, video_id: str, info: dict) -> List[Tuple[str, dict]]:
+        """Store an entry, returning the [(video_id, info), ...] evicted to make room"""
+        with self._lock:
+            self._entries[video_id] = (time.time() + self.ttl_seconds, info)
+            self._entries.move_to_end(video_id)
+            evicted = []
+            while len(self._entries) > self.max_videos:
+                old_id, (_, old_info) = self._entries.popitem(last=False)
+                evicted.append((old_id, old_info))
+            return evicted
+    
+    def update(self, video_id: str, **fields) -> None:
+        """Merge fields into an existing entry and refresh its TTL"""
+        with self._lock:
+            _, info = self._entries[video_id]
+            info.update(fields)
+            self._entries[video_id] = (time.time() + self.ttl_seconds, info)
+            self._entries.move_to_end(video_id)
+    
+    def purge_expired(self) -> List[Tuple[str, dict]]:
+        """Delete expired entries, returning [(video_id, info), ...]"""
+        with self._lock:
+            now = time.time()
+            expired = [(video_id, info) for video_id, (expires_at, info) in self._entries.items() if expires_at <= now]
+            for video_id, _ in expired:
+                del self._entries[video_id]
+            return expired
+    
+    def __contains__(self, video_id: str) -> bool:
+        """Read-only membership check: unlike get(), leaves the LRU order alone"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            return entry is not None and entry[0] > time.time()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
 
-class ProtectionResponse(BaseModel):
-    protectedVideoUri: str
+async def purge_expired_videos():
+    """Background task: drop expired video entries and their files"""
+    while True:
+        try:
+            expired = video_storage.purge_expired()
+            for video_id, info in expired:
+                delete_video_files(video_id, info)
+            if expired:
+                logger.info("🧹 Purged %d expired videos", len(expired))
+            swept = await asyncio.to_thread(
+                sweep_orphaned_files, video_storage.__contains__, VIDEO_TTL_SECONDS
+            )
+            if swept:
+                logger.info("🧹 Removed %d orphaned files", swept)
+        except Exception as e:
+            logger.error("❌ Error purging expired videos: %s", e)
+        await asyncio.sleep(PURGE_INTERVAL_SECONDS)
 
-# In-memory storage (use database in production)
-video_storage = {}
+# Bounded in-process storage: RSS and disk use stay O(VIDEO_STORE_MAX) instead of growing per upload
+VIDEO_STORE_MAX = int(os.environ.get("VIDEO_STORE_MAX", "128"))
+VIDEO_TTL_SECONDS = int(os.environ.get("VIDEO_TTL_SECONDS", "3600"))
+PURGE_INTERVAL_SECONDS = 300
+video_storage = VideoStore(VIDEO_STORE_MAX, VIDEO_TTL_SECONDS)
 
 @app.get("/")
 async def root():
@@ -246,6 +379,63 @@ async def root():
         "model_status": model_status
     }
 
+FRONTEND_PII_TYPES = ('credit_card', 'car_plate')
+
+def severity_for(confidence: float) -> str:
+    """Map detection confidence to the frontend's severity levels"""
+    if confidence >= 0.9:
+        return "high"
+    if confidence >= 0.7:
+        return "medium"
+    return "low"
+
+def build_pii_frames(video_id: str, unique_tracks: List[dict]) -> List[dict]:
+    """
+    Turn process_video() tracks into PIIFrame-shaped dicts, one per track
+    
+    Built column-wise in a single comprehension straight into response dicts,
+    instead of a PIIDetection and PIIFrame model per track.
+    """
+    track_ids = [track["track_id"] for track in unique_tracks]
+    track_types = [track["type"] for track in unique_tracks]
+    timestamps = [float(track["first_seen_timestamp"]) for track in unique_tracks]
+    confidences = [float(track["max_confidence"]) for track in unique_tracks]
+    frame_ids = [f"{video_id}_track_{track_id}" for track_id in track_ids]
+    # Frame image for each track from its crop, encoded concurrently on crop_executor
+    frame_uris = list(crop_executor.map(
+        create_frame_image_from_crop, [track.get("crop") for track in unique_tracks], frame_ids
+    ))
+    
+    return [
+        {
+            "id": frame_id,
+            "frameUri": frame_uri,
+            "timestamp": timestamp,
+            "detections": [{
+                # Map YOLO class to frontend PII type (credit_card is the fallback)
+                "type": track_type.lower() if track_type.lower() in FRONTEND_PII_TYPES else 'credit_card',
+                "confidence": confidence,
+                "description": f"{track_type} detected (ID: {track_id})",
+                "severity": severity_for(confidence)
+            }]
+        }
+        for frame_id, frame_uri, timestamp, track_id, track_type, confidence
+        in zip(frame_ids, frame_uris, timestamps, track_ids, track_types, confidences)
+    ]
+
+def check_upload(video: UploadFile) -> None:
+    """Reject non-video uploads and uploads while the model is missing"""
+    if not video.content_type or not video.content_type.startswith('video/'):
+        raise HTTPException(status_code=400, detail="File must be a video")
+    
+    if yolo_model is None:
+        raise HTTPException(status_code=503, detail="YOLO model not loaded")
+
+def store_video(video_id: str, info: dict) -> None:
+    """Save a video_storage entry and delete the files of entries it pushed out"""
+    for old_id, old_info in video_storage.set(video_id, info):
+        delete_video_files(old_id, old_info)
+
 @app.post("/api/v1/video/upload", response_model=VideoUploadResponse)
 async def upload_and_analyze_video(video: UploadFile = File(...)):
     """
@@ -257,117 +447,152 @@ async def upload_and_analyze_video(video: UploadFile = File(...)):
     3. Extract unique tracks (first occurrence of each credit card/plate)
     4. Generate frame crops for frontend review
     5. Return PII detections with frame URLs
-    """
     
-    if not video.content_type or not video.content_type.startswith('video/'):
-        raise HTTPException(status_code=400, detail="File must be a video")
-    
-    if yolo_model is None:
-        raise HTTPException(status_code=503, detail="YOLO model not loaded")
+    Holds the request open for the whole analysis; long videos should use
+    POST /api/v1/video/upload/async instead.
+    """
+    check_upload(video)
     
     # Generate unique video ID
     video_id = str(uuid.uuid4())
     
     # Save uploaded video
-    file_path = UPLOAD_DIR / f"{video_id}_{video.filename}"
+    file_path = await save_upload(video, video_id)
+    
+    # Returned as a Response so FastAPI doesn't re-validate it against response_model
+    return ORJSONResponse(await analyze_video(video_id, file_path))
+
+@app.post("/api/v1/video/upload/async", status_code=202)
+async def upload_video_async(background_tasks: BackgroundTasks, video: UploadFile = File(...)):
+    """
+    🎯 Upload video and analyze it in the background
+    
+    Returns { videoId, state } with 202 as soon as the file is saved. Poll
+    GET /api/v1/video/{videoId}/status until state is "done" (its result is the
+    same body /upload returns) or "error".
+    """
+    check_upload(video)
+    
+    video_id = str(uuid.uuid4())
+    file_path = await save_upload(video, video_id)
+    
+    store_video(video_id, {
+        "original_path": str(file_path),
+        "state": "queued",
+        "upload_time": time.time()
+    })
+    background_tasks.add_task(run_analysis, video_id, file_path)
+    
+    return ORJSONResponse({"videoId": video_id, "state": "queued"}, status_code=202)
+
+async def run_analysis(video_id: str, file_path: Path) -> None:
+    """Background task for upload_video_async: queued -> detecting -> done | error"""
     try:
-        with open(file_path, "wb") as buffer:
-            content = await video.read()
-            buffer.write(content)
-        logger.info(f"📹 Saved video: {file_path}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save video: {str(e)}")
+        video_storage.update(video_id, state="detecting")
+        await analyze_video(video_id, file_path, require_entry=True)
+    except HTTPException as e:
+        # The entry can also be evicted or expire while detection runs
+        try:
+            video_storage.update(video_id, state="error", error=e.detail)
+        except KeyError:
+            logger.warning("Video %s was evicted before its analysis failed", video_id)
+    except KeyError:
+        logger.warning("Video %s was evicted before its analysis finished", video_id)
+
+@app.get("/api/v1/video/{video_id}/status")
+async def get_video_status(video_id: str):
+    """Analysis state of an upload: queued, detecting, done (with result) or error"""
+    video_info = video_storage.get(video_id)
+    if video_info is None:
+        raise HTTPException(status_code=404, detail="Video not found")
     
+    status = {"videoId": video_id, "state": video_info.get("state", "done")}
+    if status["state"] == "done":
+        status["result"] = video_info.get("analysis")
+    elif status["state"] == "error":
+        status["error"] = video_info.get("error")
+    return status
+
+async def analyze_video(video_id: str, file_path: Path, require_entry: bool = False) -> dict:
+    """
+    Run detection and track extraction on a saved upload
+    
+    Stores the video_storage entry (state "done") for the protection step and
+    returns the VideoUploadResponse body. With require_entry the existing entry
+    is updated instead; if it was evicted meanwhile (its files are gone), the
+    new files are deleted and KeyError is raised.
+    """
     start_time = time.time()
     
     try:
         # 🤖 STEP 1: Run YOLO detection + tracking on entire video
         logger.info("🔍 Running YOLO detection...")
-        results_data = detect_video(str(file_path), MODEL_PATH)
+        # Heavy work runs on worker threads so the event loop keeps serving
+        # /health, /protected range requests and other uploads meanwhile
+        results_data, source_fps = await run_on_gpu_executor(
+            detect_video,
+            str(file_path), yolo_model, batch=DETECT_BATCH_SIZE,
+            device=yolo_device, half=yolo_device != "cpu", with_fps=True
+        )
         
         if not results_data:
             raise HTTPException(status_code=422, detail="No detection results from video")
         
         # 📊 STEP 2: Process results to extract unique tracks
         logger.info("📊 Processing detection results...")
-        processed_data = process_video(results_data, str(file_path))
+        processed_data = await asyncio.to_thread(process_video, results_data, str(file_path), source_fps)
         unique_tracks = processed_data.get("unique_tracks", [])
         fps = processed_data.get("fps", 30)
         
         if not unique_tracks:
             logger.warning("No PII objects detected in video")
         
-        # 🖼️ STEP 3: Convert tracks to frontend PII format
-        pii_frames = []
-        for i, track in enumerate(unique_tracks):
-            track_id = track["track_id"]
-            track_type = track["type"]
-            timestamp = track["first_seen_timestamp"]
-            confidence = track["max_confidence"]
-            crop_path = track.get("crop_path")
-            
-            # Create frame ID for frontend
-            frame_id = f"{video_id}_track_{track_id}"
-            
-            # Create frame image from crop
-            frame_uri = create_frame_image_from_crop(crop_path, frame_id)
-            
-            # Map YOLO class to frontend PII type
-            pii_type = track_type.lower()
-            if pii_type not in ['credit_card', 'car_plate']:
-                pii_type = 'credit_card'  # Default fallback
-            
-            # Determine severity based on confidence
-            if confidence >= 0.9:
-                severity = "high"
-            elif confidence >= 0.7:
-                severity = "medium"  
-            else:
-                severity = "low"
-            
-            # Create PII detection
-            detection = PIIDetection(
-                type=pii_type,
-                confidence=float(confidence),
-                description=f"{track_type} detected (ID: {track_id})",
-                severity=severity
-            )
-            
-            # Create PII frame
-            pii_frame = PIIFrame(
-                id=frame_id,
-                frameUri=frame_uri,
-                timestamp=float(timestamp),
-                detections=[detection]
-            )
-            
-            pii_frames.append(pii_frame)
-            
-        processing_time = int((time.time() - start_time) * 1000)
-        
-        # Store video info for protection step
-        video_storage[video_id] = {
-            "original_path": str(file_path),
-            "results_data": results_data,  # Store for blurring step
-            "pii_frames": [frame.dict() for frame in pii_frames],
-            "fps": fps,
-            "upload_time": time.time()
-        }
-        
-        logger.info(f"✅ Analysis complete: {len(pii_frames)} PII objects detected")
+        # 🖼️ STEP 3: Convert tracks to frontend PII format (encodes crops, so off the loop)
+        pii_frames = await asyncio.to_thread(build_pii_frames, video_id, unique_tracks)
         
-        response = VideoUploadResponse(
-            videoId=video_id,
-            piiFrames=pii_frames,
-            totalFramesAnalyzed=len(results_data),
-            processingTime=processing_time
+        # Keep only the boxes for the blurring step; the Results (and every
+        # decoded frame they hold) are released when this request ends
+        detections_path = await asyncio.to_thread(
+            save_detections, results_data, PROCESSED_DIR / f"{video_id}.results.npz"
         )
         
-        return response
+        processing_time = int((time.time() - start_time) * 1000)
+        
+        # Plain dicts in VideoUploadResponse's shape; no Pydantic objects per track
+        response = {
+            "videoId": video_id,
+            "piiFrames": pii_frames,
+            "totalFramesAnalyzed": len(results_data),
+            "processingTime": processing_time
+        }
         
     except Exception as e:
-        logger.error(f"❌ Error during video analysis: {e}")
+        logger.error("❌ Error during video analysis: %s", e)
         raise HTTPException(status_code=500, detail=f"Video analysis failed: {str(e)}")
+    
+    # Store video info for protection step
+    info = {
+        "original_path": str(file_path),
+        "detections_path": detections_path,
+        "pii_frames": response["piiFrames"],
+        "fps": fps,
+        "upload_time": time.time(),
+        "state": "done",
+        "analysis": response
+    }
+    if require_entry:
+        # update() raises KeyError for an evicted entry instead of recreating it
+        try:
+            video_storage.update(video_id, **info)
+        except KeyError:
+            delete_video_files(video_id, info)
+            raise
+    else:
+        store_video(video_id, info)
+    
+    logger.info("✅ Analysis complete: %d PII objects detected", len(pii_frames))
+    
+    return response
 
 @app.post("/api/v1/video/protect", response_model=ProtectionResponse)
 async def create_protected_video(request: ProtectionRequest):
@@ -375,22 +600,28 @@ async def create_protected_video(request: ProtectionRequest):
     🎯 PROTECTION ENDPOINT: Create blurred video with selected PII objects
     
     FLOW:
-    1. Get stored video info and YOLO results
+    1. Get stored video info and saved YOLO detections
     2. Extract track IDs from user-filtered PII frames  
     3. Run blur_video() to selectively blur those track IDs
     4. Return URL to protected video
     """
     
-    if request.videoId not in video_storage:
+    video_info = video_storage.get(request.videoId)
+    if video_info is None:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    video_info = video_storage[request.videoId]
+    if video_info.get("state", "done") != "done":
+        raise HTTPException(status_code=409, detail="Video analysis has not finished")
+    
     original_path = video_info["original_path"]
-    results_data = video_info["results_data"]
+    detections_path = video_info["detections_path"]
     
     if not os.path.exists(original_path):
         raise HTTPException(status_code=404, detail="Original video file not found")
     
+    if not os.path.exists(detections_path):
+        raise HTTPException(status_code=404, detail="Detection results not found")
+    
     try:
         # Extract track IDs that user wants to blur
         blur_track_ids = []
@@ -403,36 +634,51 @@ async def create_protected_video(request: ProtectionRequest):
                     track_id = int(track_id_str)
                     blur_track_ids.append(track_id)
                 except ValueError:
-                    logger.warning(f"Could not parse track ID from {frame_id}")
+                    logger.warning("Could not parse track ID from %s", frame_id)
         
         if not blur_track_ids:
             raise HTTPException(status_code=422, detail="No valid track IDs found for blurring")
         
-        logger.info(f"🎭 Blurring track IDs: {blur_track_ids}")
+        logger.info("🎭 Blurring track IDs: %s", blur_track_ids)
         
         # Create output path for protected video
-        original_name = Path(original_path).name
+        # .mov (and other) uploads are decoded directly by OpenCV, never transcoded
+        # up front; only the blurred output is written as MP4 with an .mp4 name
+        original_name = Path(original_path).with_suffix(".mp4").name
         protected_filename = f"protected_{original_name}"
         protected_path = PROCESSED_DIR / protected_filename
         
         # 🎭 STEP 1: Apply selective blurring using pipeline
         logger.info("🎭 Applying selective blurring...")
-        final_path = blur_video(results_data, str(protected_path), blur_track_ids)
+        detections = await asyncio.to_thread(load_detections, detections_path)
+        final_path = await run_on_gpu_executor(
+            blur_video, original_path, detections, str(protected_path), blur_track_ids
+        )
         
         # Update storage with protected video info
-        video_storage[request.videoId]["protected_path"] = final_path
-        video_storage[request.videoId]["blur_track_ids"] = blur_track_ids
-        video_storage[request.videoId]["protection_time"] = time.time()
+        try:
+            video_storage.update(
+                request.videoId,
+                protected_path=final_path,
+                blur_track_ids=blur_track_ids,
+                protection_time=time.time()
+            )
+        except KeyError:
+            # Evicted or expired while blur_video ran: nothing would reference the output
+            Path(final_path).unlink(missing_ok=True)
+            raise HTTPException(status_code=410, detail="Video expired during protection")
         
         # Return streaming URL 
         protected_video_uri = f"{BASE_URL}/protected/{protected_filename}"
         
-        logger.info(f"✅ Protected video created: {protected_video_uri}")
+        logger.info("✅ Protected video created: %s", protected_video_uri)
         
-        return ProtectionResponse(protectedVideoUri=protected_video_uri)
+        return ORJSONResponse({"protectedVideoUri": protected_video_uri})
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ Error creating protected video: {e}")
+        logger.error("❌ Error creating protected video: %s", e)
         raise HTTPException(status_code=500, detail=f"Video protection failed: {str(e)}")
 
 @app.get("/health")
@@ -444,14 +690,15 @@ async def health_check():
         "timestamp": time.time(),
         "videos_processed": len(video_storage),
         "model_loaded": model_loaded,
-        "model_path": MODEL_PATH
+        "model_path": yolo_model_path,
+        "model_device": str(yolo_device)
     }
 
 @app.exception_handler(Exception) 
 async def global_exception_handler(request, exc):
     """Global exception handler"""
-    logger.error(f"Global exception: {exc}")
-    return JSONResponse(
+    logger.error("Global exception: %s", exc)
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
@@ -24,7 +24,7 @@ ENDPOINTS:
 🚀 AI TEAM INTEGRATION POINTS:
 
 1. YOLO OBJECT DETECTION (replace mock PII detection):
-   - Location: extract_video_frame() function - lines 112-126
+   - Location: detect_pii_batch() function
    - Current: Mock PII boxes drawn on frames  
    - Replace with: YOLO model to detect credit cards, IDs, addresses, faces
    - Return: Real bounding box coordinates, confidence scores, classifications
@@ -35,9 +35,9 @@ ENDPOINTS:
    - Replace with: AI-powered frame selection based on content analysis
    - Method: Use YOLO to scan entire video, select frames with highest PII probability
 
-3. AI VIDEO BLURRING (replace mock emoji prefix protection):
+3. AI VIDEO BLURRING (replace mock copy-only protection):
    - Location: create_mock_protected_video() function - lines 318-347
-   - Current: Just copies original file with emoji prefix
+   - Current: Just copies original file under a protected_ name
    - Replace with: AI-powered selective blurring using detected bounding boxes
    - Method: Apply gaussian blur, pixelation, or blackout to specific regions
    - Preserve: Original video quality in non-PII regions
@@ -50,33 +50,66 @@ DEPLOYMENT:
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional, Tuple
 import uuid
 import time
 import asyncio
+import functools
+import logging
 import os
 import shutil
 import base64
+import orjson
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
 import cv2
 import numpy as np
 
+# Hardware-accelerated capture shared with the YOLO pipeline (honours VIDEO_HW_CODEC)
+from pipeline.video import open_video_capture
+
+# Storage dirs, API models, upload limits and video streaming shared with main.py
+from common import (
+    PROCESSED_DIR, FRAMES_DIR,
+    PIIDetection, PIIFrame, VideoUploadResponse, ProtectionRequest, ProtectionResponse,
+    reject_oversized_uploads, save_upload, video_file_response, delete_video_files,
+    sweep_orphaned_files,
+)
+
+# Configure logging (LOG_LEVEL=DEBUG also logs every written frame)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
+
 # Get base URL from environment or default to localhost for development
 BASE_URL = os.environ.get("BASE_URL", "http://localhost:8000")
 
-# Create directories for file storage
-UPLOAD_DIR = Path("uploads")
-PROCESSED_DIR = Path("processed")
-FRAMES_DIR = Path("frames")
-UPLOAD_DIR.mkdir(exist_ok=True)
-PROCESSED_DIR.mkdir(exist_ok=True) 
-FRAMES_DIR.mkdir(exist_ok=True)
+# Bounded pool for blocking OpenCV decode/encode, keeping it off the event loop.
+# Threads rather than processes: cv2 releases the GIL while decoding/encoding and
+# frame_cache has to live in this process for /protect to reuse it.
+DECODE_WORKERS = int(os.environ.get("DECODE_WORKERS", "2"))
+decode_executor = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="decode")
+
+app = FastAPI(title="PrivacyLens API", version="1.0.0", default_response_class=ORJSONResponse)
+
+@app.on_event("startup")
+async def startup_event():
+    """Start the expired-video cleanup task"""
+    app.state.purge_task = asyncio.create_task(purge_expired_videos())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background work and the decode worker threads"""
+    app.state.purge_task.cancel()
+    decode_executor.shutdown(wait=False, cancel_futures=True)
 
-app = FastAPI(title="PrivacyLens API", version="1.0.0")
+# 413 for oversized uploads before their body is read
+app.middleware("http")(reject_oversized_uploads)
 
 # CORS middleware for frontend integration
 app.add_middleware(
@@ -87,8 +120,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles that lets clients cache frame images for good
+    
+    Frame files are written once under a per-upload UUID name and never change.
+    StaticFiles already answers If-None-Match / If-Modified-Since with 304.
+    """
+    
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
 # Serve frame images (static files work fine for images)
-app.mount("/frames", StaticFiles(directory="frames"), name="frames")
+app.mount("/frames", ImmutableStaticFiles(directory="frames"), name="frames")
 
 # Custom video streaming endpoint for protected videos
 @app.get("/protected/{filename}")
@@ -109,209 +155,417 @@ async def stream_protected_video(filename: str, request: Request):
     if not video_path.exists():
         raise HTTPException(status_code=404, detail="Protected video not found")
     
-    # Get file stats
-    file_size = video_path.stat().st_size
+    return video_file_response(video_path, request)
+
+# Max frames handed to the detector in a single call
+FRAME_BATCH_SIZE = 16
+
+# Decoded PII frames kept between upload and protect, keyed by (video_id, timestamp)
+# A 1080p frame is ~6 MiB, so the default of 64 caps the cache at ~400 MiB
+FRAME_CACHE_SIZE = int(os.environ.get("FRAME_CACHE_SIZE", "64"))
+frame_cache: "OrderedDict[Tuple[str, float], np.ndarray]" = OrderedDict()
+frame_cache_lock = threading.Lock()  # Shared by the decode worker threads
+
+def detect_pii_batch(frames: np.ndarray, frame_specs: List[Tuple[str, float, List[str]]]) -> List[List[dict]]:
+    """
+    🔄 MOCK FUNCTION - Batched PII detection over a stack of frames
+    
+    frames: (N, H, W, 3) BGR batch (OpenCV / Ultralytics order), one entry per frame spec
+    Returns: one list of detections per frame -> {"box": [x1, y1, x2, y2], "type", "label"}
     
-    # Handle range requests for video streaming
-    range_header = request.headers.get("Range")
+    🚀 AI TEAM TODO: Replace mock PII boxes with one batched YOLO call
+    1. Load model once: model = YOLO('path/to/pii-model.pt')
+    2. Detect the whole batch at once: results = model(list(frames))
+    3. Detect: credit cards, IDs, addresses, faces, documents
+    4. Parse each result: boxes.xyxy, boxes.conf, boxes.cls
+    5. Filter: only high-confidence detections (>0.7)
+    """
+    batch_detections = []
     
-    if range_header:
-        # Parse range header (e.g., "bytes=0-1023" or "bytes=0-")
-        try:
-            range_match = range_header.replace("bytes=", "")
-            start, end = range_match.split("-")
-            start = int(start) if start else 0
-            end = int(end) if end else file_size - 1
-            end = min(end, file_size - 1)
-        except:
-            start, end = 0, file_size - 1
-            
-        # Read the requested chunk
-        with open(video_path, "rb") as video_file:
-            video_file.seek(start)
-            chunk_size = end - start + 1
-            chunk = video_file.read(chunk_size)
-            
-        headers = {
-            "Content-Range": f"bytes {start}-{end}/{file_size}",
-            "Accept-Ranges": "bytes",
-            "Content-Length": str(chunk_size),
-            "Content-Type": "video/mp4",
-            "Cache-Control": "no-cache",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "Range, Content-Type",
-        }
+    for _, timestamp_seconds, pii_types in frame_specs:
+        # MOCK: Vary positions based on timestamp to make frames visually distinct
+        base_x = int(50 + (timestamp_seconds * 30))  # Offset based on timestamp
+        base_y = int(50 + (timestamp_seconds * 20))
         
-        return Response(chunk, status_code=206, headers=headers)
-    
-    else:
-        # No range request, serve entire file
-        return FileResponse(
-            video_path,
-            media_type="video/mp4", 
-            headers={
-                "Accept-Ranges": "bytes",
-                "Content-Type": "video/mp4",
-                "Cache-Control": "no-cache",
-                "Access-Control-Allow-Origin": "*",
-                "Content-Length": str(file_size)
-            }
-        )
+        detections = []
+        for i, pii_type in enumerate(pii_types):
+            # MOCK: Vary position for each detection and timestamp
+            x_offset = base_x + (i * 20)
+            y_offset = base_y + (i * 60)
+            detections.append({
+                "box": [x_offset, y_offset, x_offset + 250, y_offset + 40],
+                "type": pii_type,
+                "label": f"{pii_type.upper()} @ {timestamp_seconds}s",
+            })
+        batch_detections.append(detections)
+    
+    return batch_detections
+
+# BGR colors per PII type for OpenCV drawing
+PII_COLORS_BGR = {'credit_card': (0, 0, 255), 'car_plate': (255, 0, 0)}
+DEFAULT_PII_COLOR_BGR = (128, 0, 128)  # purple
+
+# Progressive + Huffman-optimized JPEG: smaller /frames payloads that render
+# incrementally on the review screen, with no visible difference at quality 82
+FRAME_JPEG_PARAMS = [
+    cv2.IMWRITE_JPEG_QUALITY, int(os.environ.get("FRAME_JPEG_QUALITY", "82")),
+    cv2.IMWRITE_JPEG_PROGRESSIVE, 1,
+    cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+]
+
+def save_annotated_frame(frame_bgr: np.ndarray, frame_id: str, detections: List[dict]) -> str:
+    """
+    Draw detection boxes directly on a BGR frame and save it for the frontend
+    
+    Stays in OpenCV end to end (no RGB conversion or image-library round-trip): boxes and
+    labels are drawn in place and the frame is JPEG-encoded with cv2.imencode.
+    """
+    for detection in detections:
+        color = PII_COLORS_BGR.get(detection["type"], DEFAULT_PII_COLOR_BGR)
+        x1, y1, x2, y2 = detection["box"]
+        cv2.rectangle(frame_bgr, (x1, y1), (x2, y2), color, 3)
+        cv2.putText(frame_bgr, detection["label"], (x1 + 10, y1 + 27),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    
+    # Save frame image
+    frame_path = FRAMES_DIR / f"{frame_id}.jpg"
+    ok, buffer = cv2.imencode('.jpg', frame_bgr, FRAME_JPEG_PARAMS)
+    if not ok:
+        raise ValueError(f"Could not encode frame {frame_id}")
+    frame_path.write_bytes(buffer.tobytes())
+    
+    logger.debug("✅ Extracted frame -> %s", frame_path)
+    return f"{BASE_URL}/frames/{frame_id}.jpg"
 
-def extract_video_frame(video_path: str, frame_id: str, timestamp_seconds: float, pii_types: List[str]) -> str:
+def read_frames_at(cap: cv2.VideoCapture, frame_numbers: List[int]) -> Dict[int, np.ndarray]:
     """
-    ✅ REAL FUNCTION - Extract actual frame from uploaded video
+    Decode the requested frame numbers in one sequential pass
     
-    🚀 AI TEAM TODO: Replace mock PII detection with YOLO
+    Seeks at most once (to the first target), then grab() walks forward up to
+    the last target and retrieve() is only called on target frames. Avoids a
+    CAP_PROP_POS_FRAMES seek per timestamp, each of which jumps back to the
+    nearest keyframe and re-decodes the frames in between.
     
-    Current: Extracts real frame + adds mock PII boxes
-    Replace: 
-    1. Extract frame at timestamp (KEEP THIS)
-    2. Run YOLO model on extracted frame 
-    3. Detect: credit cards, IDs, addresses, faces, documents
-    4. Return real bounding boxes: [x1, y1, x2, y2, confidence, class]
-    5. Draw detection boxes with real coordinates (not mock)
-    
-    YOLO Integration:
-    - Load model: model = YOLO('path/to/pii-model.pt')  
-    - Detect: results = model(frame_rgb)
-    - Parse: boxes, scores, classes = results.boxes.xyxy, results.boxes.conf, results.boxes.cls
-    - Filter: only high-confidence detections (>0.7)
+    Returns: {frame_number: BGR ndarray} (missing keys = frame could not be read)
     """
+    targets = set(frame_numbers)
+    frames = {}
+    if not targets:
+        return frames
+    
+    first = min(targets)
+    if first > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    
+    for i in range(first, max(targets) + 1):
+        if not cap.grab():
+            break
+        if i in targets:
+            ret, frame = cap.retrieve()
+            if ret:
+                frames[i] = frame
+    
+    return frames
+
+def cache_frame(video_id: str, timestamp_seconds: float, frame: np.ndarray) -> None:
+    """Keep a decoded frame for the protect step, evicting the least recently used"""
+    key = (video_id, timestamp_seconds)
+    with frame_cache_lock:
+        frame_cache[key] = np.ascontiguousarray(frame, dtype=np.uint8)
+        frame_cache.move_to_end(key)
+        while len(frame_cache) > FRAME_CACHE_SIZE:
+            frame_cache.popitem(last=False)
+
+def load_pii_frames(video_id: str, video_path: str, timestamps: List[float]) -> Dict[float, np.ndarray]:
+    """
+    Get decoded frames for the given timestamps, reusing frames cached at upload
+    
+    Only timestamps missing from frame_cache (evicted, or server restarted)
+    are decoded again, in a single sequential pass.
+    Returns: {timestamp: BGR ndarray}
+    """
+    frames = {}
+    missing = []
+    with frame_cache_lock:
+        for timestamp_seconds in timestamps:
+            key = (video_id, timestamp_seconds)
+            if key in frame_cache:
+                frame_cache.move_to_end(key)
+                frames[timestamp_seconds] = frame_cache[key]
+            else:
+                missing.append(timestamp_seconds)
+    
+    if missing:
+        cap = open_video_capture(video_path)
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            frame_numbers = [max(0, min(int(ts * fps), total_frames - 1)) for ts in missing]
+            frames_by_number = read_frames_at(cap, frame_numbers)
+        finally:
+            cap.release()
+        for timestamp_seconds, frame_number in zip(missing, frame_numbers):
+            if frame_number in frames_by_number:
+                frames[timestamp_seconds] = frames_by_number[frame_number]
+                cache_frame(video_id, timestamp_seconds, frames_by_number[frame_number])
+    
+    return frames
+
+def extract_frames_batch(video_path: str, frame_specs: List[Tuple[str, float, List[str]]],
+                         video_id: Optional[str] = None) -> Dict[str, str]:
+    """
+    ✅ REAL FUNCTION - Extract several frames from the uploaded video in one pass
+    
+    frame_specs: [(frame_id, timestamp_seconds, pii_types), ...]
+    video_id: when given, decoded frames are kept in frame_cache for /protect
+    Returns: {frame_id: frame_uri}
+    
+    Opens the video once, decodes the timestamps in ascending order and copies
+    the frames into a preallocated (N, H, W, 3) buffer, FRAME_BATCH_SIZE at a
+    time, so detection runs once per batch instead of once per frame.
+    """
+    frame_uris = {}
+    
     try:
-        # Open video file
-        cap = cv2.VideoCapture(video_path)
+        # Open video file once for every requested frame
+        cap = open_video_capture(video_path)
         
         if not cap.isOpened():
-            print(f"❌ Could not open video: {video_path}")
-            return create_fallback_frame(frame_id, pii_types)
+            logger.error("❌ Could not open video: %s", video_path)
+            return {frame_id: create_fallback_frame(frame_id, pii_types) for frame_id, _, pii_types in frame_specs}
         
         # Get video properties
         fps = cap.get(cv2.CAP_PROP_FPS)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         duration = total_frames / fps if fps > 0 else 0
         
-        print(f"📹 Video info: {fps:.1f} FPS, {duration:.1f}s duration")
-        
-        # Calculate frame number for the timestamp
-        frame_number = int(timestamp_seconds * fps)
-        frame_number = min(frame_number, total_frames - 1)  # Ensure within bounds
+        logger.info("📹 Video info: %.1f FPS, %.1fs duration", fps, duration)
         
-        # Seek to the specific frame
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-        ret, frame = cap.read()
+        # Calculate frame number for every timestamp, in ascending order
+        sorted_specs = sorted(frame_specs, key=lambda s: s[1])
+        frame_numbers = [
+            max(0, min(int(timestamp_seconds * fps), total_frames - 1))  # Ensure within bounds
+            for _, timestamp_seconds, _ in sorted_specs
+        ]
         
-        if not ret:
-            print(f"❌ Could not read frame at {timestamp_seconds}s")
-            cap.release()
-            return create_fallback_frame(frame_id, pii_types)
-        
-        # Convert BGR to RGB
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(frame_rgb)
-        
-        # 🚀 AI TEAM TODO: Replace this mock section with YOLO detection
-        # MOCK PII detection annotations (REMOVE when integrating YOLO)
-        draw = ImageDraw.Draw(img)
-        colors = {'credit_card': 'red', 'car_plate': 'blue'}
-        
-        # MOCK: Vary positions based on timestamp to make frames visually distinct
-        base_x = int(50 + (timestamp_seconds * 30))  # Offset based on timestamp
-        base_y = int(50 + (timestamp_seconds * 20))
+        # Single forward decode instead of one seek per timestamp
+        frames_by_number = read_frames_at(cap, frame_numbers)
+        cap.release()
         
-        # MOCK: Remove this loop and replace with YOLO results
-        for i, pii_type in enumerate(pii_types):
-            color = colors.get(pii_type, 'purple')
-            # MOCK: Vary position for each detection and timestamp
-            x_offset = base_x + (i * 20)
-            y_offset = base_y + (i * 60)
-            box = [x_offset, y_offset, x_offset + 250, y_offset + 40]
-            draw.rectangle(box, outline=color, width=3)
-            try:
-                draw.text((x_offset + 10, y_offset + 10), f"{pii_type.upper()} @ {timestamp_seconds}s", fill=color)
-            except:
-                # Fallback if no font available
-                pass
+        decoded_specs = []
+        decoded_frames = []
+        for spec, frame_number in zip(sorted_specs, frame_numbers):
+            frame_id, timestamp_seconds, pii_types = spec
+            frame = frames_by_number.get(frame_number)
+            
+            if frame is None:
+                logger.warning("❌ Could not read frame at %ss", timestamp_seconds)
+                frame_uris[frame_id] = create_fallback_frame(frame_id, pii_types)
+                continue
             
-        # 🚀 AI TEAM TODO: Replace above with:
-        # for detection in yolo_results:
-        #     x1, y1, x2, y2 = detection.bbox
-        #     confidence = detection.confidence  
-        #     class_name = detection.class_name
-        #     color = CLASS_COLORS[class_name]
-        #     draw.rectangle([x1, y1, x2, y2], outline=color, width=3)
-        #     draw.text((x1, y1-15), f"{class_name.upper()} {confidence:.2f}", fill=color)
+            decoded_specs.append(spec)
+            decoded_frames.append(frame)
+            if video_id is not None:
+                cache_frame(video_id, timestamp_seconds, frame)
         
-        # Save frame image
-        frame_path = FRAMES_DIR / f"{frame_id}.jpg"
-        img.save(frame_path, 'JPEG', quality=85)
+        # One contiguous (N, H, W, 3) buffer of the largest batch shape, reused
+        # by every batch instead of np.stack allocating a new array each time
+        batch_buffer = None
+        if decoded_frames:
+            batch_buffer = np.empty(
+                (min(FRAME_BATCH_SIZE, len(decoded_frames)),) + decoded_frames[0].shape, dtype=np.uint8
+            )
         
-        cap.release()
-        
-        print(f"✅ Extracted frame at {timestamp_seconds}s -> {frame_path}")
-        return f"{BASE_URL}/frames/{frame_id}.jpg"
+        for start in range(0, len(decoded_frames), FRAME_BATCH_SIZE):
+            batch_specs = decoded_specs[start:start + FRAME_BATCH_SIZE]
+            batch_bgr = batch_buffer[:len(batch_specs)]
+            for slot, frame in enumerate(decoded_frames[start:start + FRAME_BATCH_SIZE]):
+                np.copyto(batch_bgr[slot], frame)
+            
+            # 🚀 AI TEAM TODO: detect_pii_batch() is the single model call per batch
+            batch_detections = detect_pii_batch(batch_bgr, batch_specs)
+            
+            for (frame_id, _, _), frame_bgr, detections in zip(batch_specs, batch_bgr, batch_detections):
+                frame_uris[frame_id] = save_annotated_frame(frame_bgr, frame_id, detections)
         
     except Exception as e:
-        print(f"❌ Error extracting frame: {e}")
-        return create_fallback_frame(frame_id, pii_types)
+        logger.error("❌ Error extracting frames: %s", e)
+        for frame_id, _, pii_types in frame_specs:
+            if frame_id not in frame_uris:
+                frame_uris[frame_id] = create_fallback_frame(frame_id, pii_types)
+    
+    return frame_uris
+
+async def extract_frames_concurrently(video_path: str, frame_specs: List[Tuple[str, float, List[str]]],
+                                      video_id: Optional[str] = None) -> Dict[str, str]:
+    """
+    Extract frames on decode_executor, one extract_frames_batch() per group of
+    FRAME_BATCH_SIZE timestamps, with the groups running concurrently
+    
+    Every group opens its own VideoCapture (a capture must never be shared
+    across threads). A few timestamps stay a single sequential pass, which is
+    cheaper than several readers seeking through the same file.
+    """
+    sorted_specs = sorted(frame_specs, key=lambda s: s[1])
+    groups = [sorted_specs[i:i + FRAME_BATCH_SIZE] for i in range(0, len(sorted_specs), FRAME_BATCH_SIZE)]
+    
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*[
+        loop.run_in_executor(decode_executor, functools.partial(
+            extract_frames_batch, video_path, group, video_id=video_id
+        ))
+        for group in groups
+    ])
+    
+    frame_uris = {}
+    for group_uris in results:
+        frame_uris.update(group_uris)
+    return frame_uris
+
+def extract_video_frame(video_path: str, frame_id: str, timestamp_seconds: float, pii_types: List[str]) -> str:
+    """
+    ✅ REAL FUNCTION - Extract a single frame from uploaded video
+    
+    Thin wrapper around extract_frames_batch() for one timestamp.
+    Prefer extract_frames_batch() when several frames are needed.
+    """
+    return extract_frames_batch(video_path, [(frame_id, timestamp_seconds, pii_types)])[frame_id]
+
+def build_fallback_template(width: int = 640, height: int = 360) -> np.ndarray:
+    """Background and border shared by every fallback frame, drawn once at import"""
+    img = np.full((height, width, 3), (230, 216, 173), dtype=np.uint8)  # lightblue (BGR)
+    cv2.rectangle(img, (50, 50), (width-50, height-50), (0, 0, 0), 2)
+    return img
+
+FALLBACK_TEMPLATE = build_fallback_template()
 
 def create_fallback_frame(frame_id: str, pii_types: List[str]) -> str:
     """
     Create a fallback mock frame if video extraction fails
     """
-    width, height = 640, 360
-    img = Image.new('RGB', (width, height), color='lightblue')
-    draw = ImageDraw.Draw(img)
+    img = FALLBACK_TEMPLATE.copy()
     
     # Add some mock content
-    draw.rectangle([50, 50, width-50, height-50], outline='black', width=2)
-    draw.text((60, 60), f"FALLBACK FRAME {frame_id}", fill='black')
+    cv2.putText(img, f"FALLBACK FRAME {frame_id}", (60, 75),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
     
     # Add mock PII annotations
     y_offset = 100
-    colors = {'credit_card': 'red', 'car_plate': 'blue'}
     
     for pii_type in pii_types:
-        color = colors.get(pii_type, 'purple')
-        box = [100, y_offset, 300, y_offset + 50]
-        draw.rectangle(box, outline=color, width=3)
-        draw.text((110, y_offset + 10), f"{pii_type.upper()} DETECTED", fill=color)
+        color = PII_COLORS_BGR.get(pii_type, DEFAULT_PII_COLOR_BGR)
+        cv2.rectangle(img, (100, y_offset), (300, y_offset + 50), color, 3)
+        cv2.putText(img, f"{pii_type.upper()} DETECTED", (110, y_offset + 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
         y_offset += 70
     
     # Save frame image
     frame_path = FRAMES_DIR / f"{frame_id}.jpg"
-    img.save(frame_path)
+    cv2.imwrite(str(frame_path), img, FRAME_JPEG_PARAMS)
     
     return f"{BASE_URL}/frames/{frame_id}.jpg"
 
-# Pydantic models for request/response
-class PIIDetection(BaseModel):
-    type: str  # 'credit_card', 'id_card', 'address'
-    confidence: float
-    description: str
-    severity: str  # 'low', 'medium', 'high'
-
-class PIIFrame(BaseModel):
-    id: str
-    frameUri: str  # URL to frame image
-    timestamp: float
-    detections: List[PIIDetection]
-
-class VideoUploadResponse(BaseModel):
-    videoId: str
-    piiFrames: List[PIIFrame]
-    totalFramesAnalyzed: int
-    processingTime: int
-
-class ProtectionRequest(BaseModel):
-    videoId: str
-    piiFrames: List[PIIFrame]
-
-class ProtectionResponse(BaseModel):
-    protectedVideoUri: str
-
-# In-memory storage for demo (use database in production)
-video_storage = {}
+class VideoStore:
+    """
+    SQLite-backed video metadata, shared by every Uvicorn worker on the host
+    
+    Entries are JSON documents keyed by video_id. They expire ttl_seconds after
+    their last write; purge_expired() drops them and returns them so their files
+    can be deleted. Survives restarts, unlike a process-local dict.
+    """
+    
+    def __init__(self, db_path: str, ttl_seconds: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS videos ("
+                "video_id TEXT PRIMARY KEY, info TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+    
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:  # Commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+    
+    def get(self, video_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT info FROM videos WHERE video_id = ? AND expires_at > ?",
+                (video_id, time.time())
+            ).fetchone()
+        return orjson.loads(row[0]) if row else None
+    
+    def set(self, video_id: str, info: dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO videos (video_id, info, expires_at) VALUES (?, ?, ?)",
+                (video_id, orjson.dumps(info), time.time() + self.ttl_seconds)
+            )
+    
+    def update(self, video_id: str, **fields) -> None:
+        """Merge fields into an existing entry and refresh its TTL"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # Lock out concurrent writers for the read-modify-write
+            row = conn.execute("SELECT info FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+            if row is None:
+                raise KeyError(video_id)
+            info = orjson.loads(row[0])
+            info.update(fields)
+            conn.execute(
+                "UPDATE videos SET info = ?, expires_at = ? WHERE video_id = ?",
+                (orjson.dumps(info), time.time() + self.ttl_seconds, video_id)
+            )
+    
+    def purge_expired(self) -> List[Tuple[str, dict]]:
+        """Delete expired entries, returning [(video_id, info), ...]"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            rows = conn.execute(
+                "SELECT video_id, info FROM videos WHERE expires_at <= ?", (now,)
+            ).fetchall()
+            conn.execute("DELETE FROM videos WHERE expires_at <= ?", (now,))
+        return [(video_id, orjson.loads(info)) for video_id, info in rows]
+    
+    def __contains__(self, video_id: str) -> bool:
+        return self.get(video_id) is not None
+    
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM videos WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+
+async def purge_expired_videos():
+    """Background task: drop expired video entries and their files"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            expired = await loop.run_in_executor(None, video_storage.purge_expired)
+            for video_id, info in expired:
+                delete_video_files(video_id, info)
+            if expired:
+                logger.info("🧹 Purged %d expired videos", len(expired))
+            swept = await loop.run_in_executor(
+                None, sweep_orphaned_files, video_storage.__contains__, VIDEO_TTL_SECONDS
+            )
+            if swept:
+                logger.info("🧹 Removed %d orphaned files", swept)
+        except Exception as e:
+            logger.error("❌ Error purging expired videos: %s", e)
+        await asyncio.sleep(PURGE_INTERVAL_SECONDS)
+
+# Persistent storage shared across workers (swap for Redis when running on several hosts)
+VIDEO_DB_PATH = os.environ.get("VIDEO_DB_PATH", "privacylens.db")
+VIDEO_TTL_SECONDS = int(os.environ.get("VIDEO_TTL_SECONDS", "3600"))
+PURGE_INTERVAL_SECONDS = 300
+video_storage = VideoStore(VIDEO_DB_PATH, VIDEO_TTL_SECONDS)
 
 @app.get("/")
 async def root():
@@ -338,7 +592,7 @@ async def upload_and_analyze_video(video: UploadFile = File(...)):
     
     2. REAL PII DETECTION: Replace mock detection data  
        - Current: lines 279-325 (mock PIIFrame objects)
-       - Replace: Use real YOLO detection results from extract_video_frame()
+       - Replace: Use real YOLO detection results from detect_pii_batch()
        - Return: Real confidence scores, bounding boxes, classifications
     
     3. PERFORMANCE OPTIMIZATION:
@@ -354,22 +608,21 @@ async def upload_and_analyze_video(video: UploadFile = File(...)):
     video_id = str(uuid.uuid4())
     
     # ✅ WORKING: Save uploaded video file
-    file_path = UPLOAD_DIR / f"{video_id}_{video.filename}"
-    try:
-        with open(file_path, "wb") as buffer:
-            content = await video.read()
-            buffer.write(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save video: {str(e)}")
+    file_path = await save_upload(video, video_id)
     
     # Start processing
     start_time = time.time()
     
     # ✅ REAL: Extract actual frames from video at 1, 2, 3 seconds
-    print(f"📹 Extracting frames from: {file_path}")
-    frame_1_uri = extract_video_frame(str(file_path), f"{video_id}_frame_1", 1.0, ["credit_card"])
-    frame_2_uri = extract_video_frame(str(file_path), f"{video_id}_frame_2", 2.0, ["car_plate", "credit_card"]) 
-    frame_3_uri = extract_video_frame(str(file_path), f"{video_id}_frame_3", 3.0, ["car_plate"])
+    logger.info("📹 Extracting frames from: %s", file_path)
+    frame_uris = await extract_frames_concurrently(str(file_path), [
+        (f"{video_id}_frame_1", 1.0, ["credit_card"]),
+        (f"{video_id}_frame_2", 2.0, ["car_plate", "credit_card"]),
+        (f"{video_id}_frame_3", 3.0, ["car_plate"]),
+    ], video_id=video_id)
+    frame_1_uri = frame_uris[f"{video_id}_frame_1"]
+    frame_2_uri = frame_uris[f"{video_id}_frame_2"]
+    frame_3_uri = frame_uris[f"{video_id}_frame_3"]
     
     # 🔄 MOCK PII detection results - REPLACE with real AI/ML processing
     mock_pii_frames = [
@@ -422,34 +675,41 @@ async def upload_and_analyze_video(video: UploadFile = File(...)):
     
     processing_time = int((time.time() - start_time) * 1000)
     
+    pii_frames = [frame.model_dump() for frame in mock_pii_frames]
+    
     # ✅ WORKING: Store video info for later processing
-    video_storage[video_id] = {
+    # (VideoStore calls are blocking SQLite I/O, so every handler runs them off the loop)
+    await asyncio.to_thread(video_storage.set, video_id, {
         "original_path": str(file_path),
-        "pii_frames": [frame.dict() for frame in mock_pii_frames],
+        "pii_frames": pii_frames,
         "upload_time": time.time()
-    }
-    
-    response = VideoUploadResponse(
-        videoId=video_id,
-        piiFrames=mock_pii_frames,
-        totalFramesAnalyzed=245,  # 🔄 MOCK: Real frame count
-        processingTime=processing_time
-    )
-    
-    return response
-
-def create_mock_protected_video(original_path: str, video_id: str, pii_frames: List[dict]) -> str:
+    })
+    
+    # Returned as a Response so FastAPI doesn't re-validate it against response_model
+    return ORJSONResponse({
+        "videoId": video_id,
+        "piiFrames": pii_frames,
+        "totalFramesAnalyzed": 245,  # 🔄 MOCK: Real frame count
+        "processingTime": processing_time
+    })
+
+def create_mock_protected_video(original_path: str, video_id: str, pii_frames: List[dict],
+                                pii_frame_images: Optional[Dict[float, np.ndarray]] = None) -> str:
     """
     🔄 MOCK FUNCTION - Replace with real video blurring AI
     
-    Current: Just copies original file with emoji prefix  
+    Current: Just copies original file under a protected_ name
     Replace: Apply AI-powered selective blurring to PII regions
     
+    pii_frame_images: decoded PII frames by timestamp (from frame_cache), so the
+    blurring step does not have to decode them from the video again
+    
     🚀 AI TEAM TODO - VIDEO BLURRING PIPELINE:
     
     1. PARSE PII REGIONS from pii_frames parameter:
        - Extract: frame timestamps, bounding boxes [x1,y1,x2,y2], PII types
        - Group: PII detections by timestamp for batch processing
+       - Reuse: pii_frame_images instead of re-decoding those frames
     
     2. FRAME-BY-FRAME PROCESSING:
        - Load video with OpenCV: cap = cv2.VideoCapture(original_path)
@@ -481,18 +741,19 @@ def create_mock_protected_video(original_path: str, video_id: str, pii_frames: L
     # Get original filename
     original_name = Path(original_path).name
     
-    # Create "protected" filename with emoji prefix (mock protection indicator)
-    protected_filename = f"🔒_PROTECTED_{original_name}"
+    # ASCII-only name keyed by video_id; "protected" is tracked in video_storage
+    protected_filename = f"protected_{video_id}{Path(original_name).suffix}"
     protected_path = PROCESSED_DIR / protected_filename
     
     # 🔄 MOCK: Copy original file with new name
     # 🚀 REPLACE: Apply real blurring AI to PII regions in video
     try:
         shutil.copy2(original_path, protected_path)
-        print(f"🔄 MOCK: Created 'protected' video with emoji prefix")
-        print(f"   Original: {original_name}")
-        print(f"   Protected: {protected_filename}")
-        print(f"   PII objects to blur: {len(pii_frames)} frames")
+        logger.info(
+            "🔄 MOCK: Created 'protected' video copy %s -> %s "
+            "(%d PII frames to blur, %d decoded PII frames available)",
+            original_name, protected_filename, len(pii_frames), len(pii_frame_images or {})
+        )
     except Exception as e:
         raise Exception(f"Failed to create mock protected video: {str(e)}")
     
@@ -508,7 +769,7 @@ async def create_protected_video(request: ProtectionRequest):
     
     🔄 MOCK IMPLEMENTATION:
     - Receives filtered PII objects ✅ (WORKING)
-    - Copies video with emoji prefix 🔒 (REPLACE with real blurring)
+    - Copies video to protected_{videoId} 🔒 (REPLACE with real blurring)
     - Returns protected video URL ✅ (WORKING)
     
     🚀 TO REPLACE:
@@ -518,41 +779,58 @@ async def create_protected_video(request: ProtectionRequest):
     4. Multiple protection methods: blur, pixelate, blackout options
     """
     
-    if request.videoId not in video_storage:
+    video_info = await asyncio.to_thread(video_storage.get, request.videoId)
+    if video_info is None:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    video_info = video_storage[request.videoId]
     original_path = video_info["original_path"]
     
     if not os.path.exists(original_path):
         raise HTTPException(status_code=404, detail="Original video file not found")
     
-    # Simulate AI video processing time
-    await asyncio.sleep(3)  # 🔄 MOCK: Remove this delay in production
-    
-    # 🔄 MOCK: Create "protected" video with emoji prefix
+    # 🔄 MOCK: Create "protected" video copy
     # 🚀 REPLACE: Apply real AI blurring to PII regions
+    # Dumped once; shared by the protected-video builder and the stored entry
+    pii_frames = [frame.model_dump() for frame in request.piiFrames]
+    
     try:
-        protected_path = create_mock_protected_video(
+        # Reuse frames decoded at upload instead of decoding them again
+        loop = asyncio.get_running_loop()
+        pii_frame_images = await loop.run_in_executor(
+            decode_executor,
+            load_pii_frames,
+            request.videoId,
+            original_path,
+            [frame.timestamp for frame in request.piiFrames]
+        )
+        # The copy is disk-bound (a multi-GB upload takes seconds), so off the loop
+        protected_path = await asyncio.to_thread(
+            create_mock_protected_video,
             original_path, 
             request.videoId, 
-            [frame.dict() for frame in request.piiFrames]
+            pii_frames,
+            pii_frame_images
         )
         protected_filename = Path(protected_path).name
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
     # ✅ WORKING: Update video storage with protected video info
-    video_storage[request.videoId]["protected_path"] = protected_path
-    video_storage[request.videoId]["protected_pii"] = [frame.dict() for frame in request.piiFrames]
-    video_storage[request.videoId]["protection_time"] = time.time()
+    await asyncio.to_thread(
+        video_storage.update,
+        request.videoId,
+        protected_path=protected_path,
+        protected=True,
+        protected_pii=pii_frames,
+        protection_time=time.time()
+    )
     
     # ✅ WORKING: Return URL to serve protected video
     protected_video_uri = f"{BASE_URL}/protected/{protected_filename}"
     
-    print(f"✅ Created protected video: {protected_video_uri}")
+    logger.info("✅ Created protected video: %s", protected_video_uri)
     
-    return ProtectionResponse(protectedVideoUri=protected_video_uri)
+    return ORJSONResponse({"protectedVideoUri": protected_video_uri})
 
 # Note: Frame and protected video serving is handled by StaticFiles middleware above
 # Files are automatically served from:
@@ -565,13 +843,13 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": time.time(),
-        "videos_processed": len(video_storage)
+        "videos_processed": await asyncio.to_thread(len, video_storage)
     }
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler for better error responses"""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
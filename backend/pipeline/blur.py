@@ -1,101 +1,291 @@
+import logging
+import os
+import queue
+import threading
+from pathlib import Path
 import cv2
+import numpy as np
 from collections import deque
 
-# Store IDs that must always be blurred
-blurred_ids = set()
-blur_counters = {}  # {track_id: frames_remaining}
+from pipeline.regions import apply_blur, clip_boxes, merge_boxes
+from pipeline.video import capture_fps, open_video_capture, open_video_writer
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:  # Numba is optional; pixelation falls back to OpenCV
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+    prange = range
+
 BUFFER_FRAMES = 10  # temporal window before/after to blur
 
-def blur_video(results_data, output_video_path, blur_ids):
+BLUR_MODE = os.environ.get("BLUR_MODE", "gaussian")  # 'gaussian' | 'pixelate' | 'blackout'
+PIXELATE_BLOCK = 16  # mosaic cell size in pixels
+WRITE_QUEUE_FRAMES = 8  # finished frames waiting for the writer thread
+
+def blur_video(video_path, detections, output_video_path, blur_ids):
     """
     Blur only the specified track IDs in blur_ids.
-    results_data: list of Results objects
+    video_path: source video, decoded again frame by frame
+    detections: arrays from pipeline.detect.load_detections()
     output_video_path: path to save blurred video
     blur_ids: list or set of track IDs to blur
     Returns output_video_path
+
+    The video is written to a temporary file next to output_video_path and
+    renamed over it once complete, so a reader never sees a partial MP4.
+    Blur state is local to the call, so concurrent blur_video calls for
+    different videos never see each other's track IDs.
     """
-    global blurred_ids, blur_counters
-    blurred_ids.clear()
-    blur_counters.clear()
+    frame_idx = detections["frame_idx"]
+    boxes = detections["boxes"]
+    ids = detections["ids"]
+    cls = detections["cls"]
+    names = detections["names"]
+    frame_count = int(detections["frame_count"])
+    # Rows of frame i are starts[i]:starts[i + 1] (frame_idx is sorted)
+    starts = np.searchsorted(frame_idx, np.arange(frame_count + 1))
 
-    blurred_ids.update(set(blur_ids))
+    # IDs that must always be blurred, as a lookup table indexed by track ID + 1
+    # (untracked boxes are -1 and land in slot 0, which is never set).
+    # blur_ids comes from the client: only IDs actually tracked are kept, so a
+    # huge or negative ID can neither size the table nor hit slot 0
+    blur_id_array = np.intersect1d(np.fromiter(set(blur_ids), dtype=np.int64), ids[ids >= 0])
+    blur_lut = np.zeros(int(ids.max(initial=-1)) + 2, dtype=bool)
+    blur_lut[blur_id_array + 1] = True
+    # Frames holding at least one box to blur; every other frame is written untouched
+    frames_to_blur = np.zeros(frame_count, dtype=bool)
+    frames_to_blur[frame_idx[blur_lut[ids + 1]]] = True
 
-    # Get video props from first frame
-    h, w = results_data[0].orig_img.shape[:2]
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(str(output_video_path), fourcc, 30, (w, h))
+    # Keep the real extension last: VideoWriter picks the container from it
+    output_video_path = Path(output_video_path)
+    tmp_path = output_video_path.with_name(f"{output_video_path.stem}.tmp{output_video_path.suffix}")
 
+    cap = open_video_capture(video_path)
+    out = None
+    writer = None
     frame_buffer = deque(maxlen=BUFFER_FRAMES)
+    # Decode target ring, allocated once from the first frame's shape: a slot is
+    # reused only after its frame has left frame_buffer and the writer queue and
+    # been written, so it needs more slots than frames that can be in flight
+    ring = None
 
-    for result in results_data:
-        frame = result.orig_img.copy()
-        frame_buffer.append([frame, result])
-        process_frame(frame, result, blurred_ids)
+    try:
+        for i in range(frame_count):
+            ret, frame = cap.read(ring[i % len(ring)] if ring else None)
+            if not ret:
+                break
+            if out is None:
+                # Get video props from first frame; keep the source frame rate so
+                # the output plays at the original speed (30 when unknown)
+                h, w = frame.shape[:2]
+                out = open_video_writer(tmp_path, capture_fps(cap) or 30, (w, h))
+                writer = _BackgroundWriter(out, WRITE_QUEUE_FRAMES)
+                ring = [np.empty_like(frame) for _ in range(BUFFER_FRAMES + WRITE_QUEUE_FRAMES + 2)]
 
-        update_counters()
+            frame_buffer.append(frame)
+            if frames_to_blur[i]:
+                rows = slice(starts[i], starts[i + 1])
+                process_frame(frame, boxes[rows], ids[rows], cls[rows], names, blur_lut)
 
-        if len(frame_buffer) == BUFFER_FRAMES:
-            oldest_frame, _ = frame_buffer.popleft()
-            out.write(oldest_frame)
+            if len(frame_buffer) == BUFFER_FRAMES:
+                writer.write(frame_buffer.popleft())
 
-    while frame_buffer:
-        oldest_frame, _ = frame_buffer.popleft()
-        out.write(oldest_frame)
+        if out is None:
+            raise ValueError(f"Could not read frames from {video_path}")
 
-    out.release()
-    print(f"Blurring complete. Output saved to: {output_video_path}")
+        while frame_buffer:
+            writer.write(frame_buffer.popleft())
+        writer.close()
+        if writer.error is not None:
+            raise writer.error
+        out.release()
+        os.replace(tmp_path, output_video_path)  # Atomic publish
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.close()
+        if out is not None:
+            out.release()
+        tmp_path.unlink(missing_ok=True)
+
+    logger.info("Blurring complete. Output saved to: %s", output_video_path)
     return str(output_video_path)
 
 
-def process_frame(frame, result, blur_ids):
+class _BackgroundWriter:
     """
-    Blur only detections with track_id in blur_ids.
+    Feed a VideoWriter from its own thread, so encoding (which releases the
+    GIL) overlaps decoding and blurring the next frames
     """
-    boxes_xyxy = result.boxes.xyxy.cpu().numpy().astype(int)
-    class_ids = result.boxes.cls.cpu().numpy().astype(int)
-    names = [result.names[cls_id] for cls_id in class_ids]
-    track_ids = (
-        result.boxes.id.cpu().numpy().astype(int)
-        if result.boxes.id is not None else None
-    )
-
-    if track_ids is None:
+
+    def __init__(self, out, max_pending):
+        self.out = out
+        self.frames = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="video-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while (frame := self.frames.get()) is not None:
+            if self.error is None:
+                try:
+                    self.out.write(frame)
+                except Exception as e:  # Keep draining so write() never blocks on a full queue
+                    self.error = e
+
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        self.frames.put(frame)
+
+    def close(self):
+        """ Write out every queued frame and stop the thread; safe to call twice """
+        if self.thread.is_alive():
+            self.frames.put(None)
+            self.thread.join()
+
+
+def process_frame(frame, boxes_xyxy, track_ids, class_ids, names, blur_lut):
+    """
+    Blur only detections whose track ID is set in blur_lut (indexed by track_id + 1).
+    """
+    keep = blur_lut[track_ids + 1]
+    if not keep.any():
         return
 
-    for i, box in enumerate(boxes_xyxy):
-        track_id = track_ids[i]
-        if track_id in blur_ids:
+    selected_boxes = clip_boxes(boxes_xyxy[keep], frame.shape[1], frame.shape[0])
+    # Labels keep the original boxes; only the blurred area is merged
+    apply_blur_regions(frame, merge_boxes(selected_boxes))
+
+    for (x1, y1, _, _), class_id, track_id in zip(selected_boxes, class_ids[keep], track_ids[keep]):
+        label = f"{names[class_id]} ID:{track_id}"
+        cv2.putText(frame, label, (int(x1), max(0, int(y1) - 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+
+def apply_blur_regions(frame, boxes):
+    """ Obscure every box of one frame using BLUR_MODE """
+    if BLUR_MODE == "pixelate":
+        if NUMBA_AVAILABLE:
+            pixelate_regions(frame, np.ascontiguousarray(boxes, dtype=np.int64), PIXELATE_BLOCK)
+        else:
+            for box in boxes:
+                _pixelate_roi(frame, box, PIXELATE_BLOCK)
+    elif BLUR_MODE == "blackout":
+        for x1, y1, x2, y2 in boxes:
+            frame[max(0, y1):max(0, y2), max(0, x1):max(0, x2)] = 0
+    elif CUDA_BLUR:
+        _gpu_blur_regions(frame, boxes)
+    else:
+        for box in boxes:
             apply_blur(frame, box)
-            label = f"{names[i]} ID:{track_id}"
-            x1, y1, _, _ = box
-            cv2.putText(frame, label, (x1, max(0, y1 - 10)),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-def retro_blur(frame, result, new_ids):
-    """ Retroactively blur new IDs in past buffered frames """
-    boxes_xyxy = result.boxes.xyxy.cpu().numpy().astype(int)
-    track_ids = (
-        result.boxes.id.cpu().numpy().astype(int)
-        if result.boxes.id is not None else None
-    )
-    if track_ids is None:
-        return
 
-    for i, box in enumerate(boxes_xyxy):
-        if track_ids[i] in new_ids:
+
+def _cuda_device_count():
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount()
+    except (AttributeError, cv2.error):  # OpenCV built without CUDA
+        return 0
+
+
+CUDA_BLUR = _cuda_device_count() > 0
+# Filter and device buffers per thread (GPU_WORKERS may blur several videos at
+# once); the GpuMats are reused frame after frame instead of reallocated
+_gpu_local = threading.local()
+# CUDA's 31x31 cap blurs less than the CPU's sigma ~14 in one pass; Gaussian passes
+# add variance, and three 31-tap passes (sigma ~15) spread at least as far
+GPU_BLUR_PASSES = 3
+
+
+def _gpu_blur_state():
+    if not hasattr(_gpu_local, "filter"):
+        _gpu_local.filter = cv2.cuda.createGaussianFilter(cv2.CV_8UC4, cv2.CV_8UC4, (31, 31), 30)
+        _gpu_local.frame = cv2.cuda_GpuMat()
+        _gpu_local.bgra = cv2.cuda_GpuMat()
+    return _gpu_local.filter, _gpu_local.frame, _gpu_local.bgra
+
+
+def _gpu_blur_regions(frame, boxes):
+    """
+    Blur all boxes of a frame on the GPU with one upload and one download
+
+    CUDA separable filters take 1- or 4-channel 8-bit input and at most a
+    32-tap kernel, so the frame is blurred as BGRA with a 31x31 kernel applied
+    GPU_BLUR_PASSES times, matching the CPU paths' strength (see pipeline.regions).
+    Falls back to the CPU path on any CUDA error.
+    """
+    h, w = frame.shape[:2]
+    try:
+        gpu_filter, gpu_frame, gpu_bgra = _gpu_blur_state()
+        gpu_frame.upload(frame)  # Reuses the device allocation while the size is unchanged
+        cv2.cuda.cvtColor(gpu_frame, cv2.COLOR_BGR2BGRA, gpu_bgra)
+        for x1, y1, x2, y2 in boxes:
+            x1, y1 = max(0, int(x1)), max(0, int(y1))
+            x2, y2 = min(w, int(x2)), min(h, int(y2))
+            if x2 <= x1 or y2 <= y1:
+                continue
+            gpu_roi = cv2.cuda_GpuMat(gpu_bgra, (x1, y1, x2 - x1, y2 - y1))
+            for _ in range(GPU_BLUR_PASSES):
+                gpu_filter.apply(gpu_roi).copyTo(gpu_roi)
+        cv2.cuda.cvtColor(gpu_bgra, cv2.COLOR_BGRA2BGR, gpu_frame)
+        gpu_frame.download(frame)
+    except cv2.error:
+        for box in boxes:
             apply_blur(frame, box)
 
 
-def apply_blur(frame, box):
-    """ Apply Gaussian blur to region defined by box """
-    x1, y1, x2, y2 = box
+@njit(parallel=True, cache=True)
+def pixelate_regions(frame, boxes, block):
+    """ Pixelate boxes in-place: every block x block cell becomes its mean color """
+    h, w, channels = frame.shape
+    for b in range(boxes.shape[0]):
+        x1 = max(0, boxes[b, 0])
+        y1 = max(0, boxes[b, 1])
+        x2 = min(w, boxes[b, 2])
+        y2 = min(h, boxes[b, 3])
+        if x2 <= x1 or y2 <= y1:
+            continue
+        n_rows = (y2 - y1 + block - 1) // block
+        # Rows of cells are independent, so they are split across threads
+        for r in prange(n_rows):
+            cy1 = y1 + r * block
+            cy2 = min(cy1 + block, y2)
+            for cx1 in range(x1, x2, block):
+                cx2 = min(cx1 + block, x2)
+                count = (cy2 - cy1) * (cx2 - cx1)
+                for c in range(channels):
+                    total = 0
+                    for y in range(cy1, cy2):
+                        for x in range(cx1, cx2):
+                            total += frame[y, x, c]
+                    mean = total // count
+                    for y in range(cy1, cy2):
+                        for x in range(cx1, cx2):
+                            frame[y, x, c] = mean
+
+
+def _pixelate_roi(frame, box, block):
+    """ OpenCV pixelation for a single box, used when Numba is not installed """
+    x1, y1, x2, y2 = [max(0, int(v)) for v in box]
     roi = frame[y1:y2, x1:x2]
     if roi.size > 0:
-        blurred_roi = cv2.GaussianBlur(roi, (51, 51), 30)
-        frame[y1:y2, x1:x2] = blurred_roi
+        h, w = roi.shape[:2]
+        small = cv2.resize(roi, (max(1, w // block), max(1, h // block)), interpolation=cv2.INTER_AREA)
+        frame[y1:y2, x1:x2] = cv2.resize(small, (w, h), interpolation=cv2.INTER_NEAREST)
+
 
+def warmup_blur_kernels():
+    """ Compile the Numba kernels up front so the first /protect call doesn't pay for it """
+    if NUMBA_AVAILABLE:
+        dummy = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        pixelate_regions(dummy, np.array([[0, 0, 64, 64]], dtype=np.int64), PIXELATE_BLOCK)
 
-def update_counters():
-    global blur_counters
-    for tid in list(blur_counters.keys()):
-        blur_counters[tid] = max(0, blur_counters[tid] - 1)
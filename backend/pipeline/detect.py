@@ -1,21 +1,167 @@
+import os
+import queue
+import threading
+import numpy as np
 from ultralytics import YOLO
 
-def detect_video(input_video_path, model_path):
-    """Run YOLO detection+tracking, return a list of (frame, result) pairs."""
-    model = YOLO(model_path)
+from pipeline.video import open_video_capture, capture_fps
+
+# A YOLO instance and its tracker are not thread-safe; one video at a time per process
+_track_lock = threading.Lock()
+
+# Batches decoded ahead of the model; bounds the frames held in memory while decoding overlaps inference
+DECODE_AHEAD_BATCHES = int(os.environ.get("DECODE_AHEAD_BATCHES", "2"))
+
+def detect_video(input_video_path, model, batch=1, stride=1, device=None, half=False, with_fps=False):
+    """Run YOLO detection+tracking, return a list of Results, one per sampled frame.
+
+    model: a loaded YOLO instance (preloaded once at startup), or a weights path
+        to load for this call only.
+    batch: frames per model call; >1 amortises per-call overhead on the GPU.
+    stride: decode every stride-th frame only (results[i] is source frame
+        i * stride). Skipped frames are grab()bed without being decoded.
+        Keep it at 1 when the results feed blur_video, which pairs
+        results[i] with source frame i.
+    device / half: inference device (e.g. 0 for the first CUDA GPU, "cpu") and
+        FP16; set them explicitly so a GPU host never silently runs on the CPU.
+    with_fps: return (results, fps) instead, fps read from the capture already
+        open here (0.0 if unknown) so callers needn't probe the file again.
+    """
+    if isinstance(model, (str, os.PathLike)):
+        model = YOLO(model)
 
     results_data = []
 
-    # Run YOLO tracking (generator)
-    results = model.track(
-        source=input_video_path,
+    cap = open_video_capture(input_video_path)
+    fps = capture_fps(cap)
+    # The next batches decode on their own thread (cv2 releases the GIL) while
+    # the model runs; a single in-order reader, since tracking needs frame order
+    batches = queue.Queue(maxsize=DECODE_AHEAD_BATCHES)
+    stop = threading.Event()
+    decoder = threading.Thread(
+        target=_decode_batches, args=(cap, batch, stride, batches, stop), name="decode", daemon=True
+    )
+    with _track_lock:
+        _reset_trackers(model)
+        decoder.start()
+        try:
+            while (frames := batches.get()) is not None:
+                if isinstance(frames, Exception):
+                    raise frames
+                results_data.extend(_track_batch(model, frames, device, half))
+        finally:
+            stop.set()
+            decoder.join()
+            cap.release()
+
+    return (results_data, fps) if with_fps else results_data
+
+def _decode_batches(cap, batch, stride, out, stop):
+    """Decoder thread: put lists of up to batch frames on out, then None (or the error)."""
+    try:
+        frames = []
+        frame_index = 0
+        while cap.grab():
+            if frame_index % stride == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                frames.append(frame)
+                if len(frames) == batch:
+                    if not _put_unless_stopped(out, frames, stop):
+                        return
+                    frames = []
+            frame_index += 1
+
+        if frames and not _put_unless_stopped(out, frames, stop):
+            return
+    except Exception as e:
+        _put_unless_stopped(out, e, stop)
+        return
+    _put_unless_stopped(out, None, stop)
+
+def _put_unless_stopped(out, item, stop):
+    """Block until item is queued; False once stop is set (the consumer gave up)."""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _reset_trackers(model):
+    """Drop track state left by the previous video on a shared model."""
+    for tracker in getattr(getattr(model, "predictor", None), "trackers", None) or []:
+        tracker.reset()
+
+def _track_batch(model, frames, device=None, half=False):
+    """One model.track call on a list of frames; persist keeps track IDs across batches."""
+    return model.track(
+        source=frames,
         # tracker="bytetrack.yaml",
-        stream=True,
-        # show=True,
-        conf=0.8
+        persist=True,
+        conf=0.8,
+        device=device,
+        half=half,
+        verbose=False
     )
 
-    for result in results:
-        results_data.append( result)
+def save_detections(results_data, path):
+    """Write the boxes of results_data to an uncompressed .npz for blur_video.
+
+    Only what blurring needs is kept (frame index, xyxy box, track id, class):
+    a few KB per video, where the Results also hold every decoded frame.
+    Arrays: frame_idx (M,), boxes (M, 4), ids (M,) with -1 = untracked,
+    cls (M,), names (K,) class names, frame_count ().
+    """
+    frame_idx, boxes, ids, cls = [], [], [], []
+    for i, result in enumerate(results_data):
+        xyxy, track_ids, _, class_ids = boxes_to_numpy(result)
+        if len(xyxy) == 0:
+            continue
+        frame_idx.append(np.full(len(xyxy), i, dtype=np.int32))
+        boxes.append(xyxy.astype(np.int32))
+        ids.append(track_ids)
+        cls.append(class_ids)
+
+    names = results_data[0].names if results_data else {}
+    np.savez(
+        path,
+        frame_idx=_concat(frame_idx, (0,)),
+        boxes=_concat(boxes, (0, 4)),
+        ids=_concat(ids, (0,)),
+        cls=_concat(cls, (0,)),
+        names=np.array(class_name_table(names), dtype=str),
+        frame_count=np.int64(len(results_data)),
+    )
+    return str(path)
+
+def class_name_table(names):
+    """Result.names dict {class_id: name} as a list indexed by class id (gaps get str(id))."""
+    return [names.get(k, str(k)) for k in range(max(names, default=-1) + 1)]
+
+def boxes_to_numpy(result):
+    """Copy a frame's boxes to the host in one transfer.
+
+    result.boxes.data is (N, 7) [x1, y1, x2, y2, id, conf, cls] when tracked,
+    (N, 6) without ids; one .cpu() replaces a device sync per column.
+    Returns (xyxy float32 (N, 4), ids int32 (N,) with -1 = untracked,
+    conf float32 (N,), cls int32 (N,)).
+    """
+    if result.boxes is None or len(result.boxes) == 0:
+        return (np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.int32),
+                np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int32))
+    data = result.boxes.data.cpu().numpy()
+    tracked = data.shape[1] == 7
+    ids = data[:, 4].astype(np.int32) if tracked else np.full(len(data), -1, dtype=np.int32)
+    return (data[:, :4].astype(np.float32), ids,
+            data[:, -2].astype(np.float32), data[:, -1].astype(np.int32))
+
+def load_detections(path):
+    """Read a save_detections() file back into a dict of arrays."""
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
 
-    return results_data
\ No newline at end of file
+def _concat(parts, empty_shape):
+    return np.concatenate(parts) if parts else np.empty(empty_shape, dtype=np.int32)
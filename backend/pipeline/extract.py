@@ -1,28 +1,29 @@
 from ultralytics import YOLO
 import os
 import cv2
-import uuid
+import numpy as np
 
+from pipeline.detect import boxes_to_numpy, class_name_table
+from pipeline.video import capture_fps
 
-def process_video(results, video_path):
+# OpenCV's JPEG encoder is libjpeg-turbo (SIMD DCT/Huffman); no optimize pass for crops
+CROP_JPEG_PARAMS = [
+    cv2.IMWRITE_JPEG_QUALITY, int(os.environ.get("CROP_JPEG_QUALITY", "80")),
+    cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+]
+
+def process_video(results, video_path, fps=None):
 
     if not os.path.exists(video_path):
         raise FileNotFoundError(f"Video file not found: {video_path}")
     
-    # Determine FPS for timestamp estimation
-    fps = _get_video_fps(video_path) or 30.0
-
-    # Build JSON-friendly summary of first-seen tracks with crop and timestamp
-    save_dir = None
-    try:
-        
-        # Most Ultralytics results include save_dir attribute when save=True
-        if len(results) > 0 and hasattr(results[0], "save_dir") and results[0].save_dir is not None:
-            save_dir = str(results[0].save_dir)
-    except Exception:
-        pass
+    # Determine FPS for timestamp estimation (pass it in to skip reopening the video)
+    if fps is None:
+        fps = _get_video_fps(video_path)
+    fps = fps or 30.0
 
-    unique_tracks = _extract_unique_tracks(results, fps=fps, base_save_dir=save_dir)
+    # Summary of first-seen tracks with an in-memory crop and timestamp
+    unique_tracks = _extract_unique_tracks(results, fps=fps)
     
     return {"unique_tracks": unique_tracks, "fps": fps}
 
@@ -31,84 +32,85 @@ def process_video(results, video_path):
 def _get_video_fps(video_path: str) -> float:
     cap = cv2.VideoCapture(video_path)
     try:
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        return round(float(fps)) if fps and fps > 0 else 0.0
+        return capture_fps(cap)
     finally:
         cap.release()
 
 
-def _ensure_dir(path: str) -> None:
-    if not os.path.exists(path):
-        os.makedirs(path, exist_ok=True)
-
-def _extract_unique_tracks(results, fps: float, base_save_dir: str | None = None):
-    unique_by_track = {}
-
-    # Where to store crops
-    if base_save_dir is None:
-        base_save_dir = os.path.join(os.path.dirname(__file__), "runs", "detect", "track")
-    custom_crop_dir = os.path.join(base_save_dir, "track_crops")
-    _ensure_dir(custom_crop_dir)
+def _extract_unique_tracks(results, fps: float):
+    # Class names come from the one model behind every result: build the lookup once
+    class_names = class_name_table(getattr(results[0], "names", {})) if results else []
 
+    # Flatten every tracked detection into columns, in frame order
+    frame_parts, xyxy_parts, id_parts, conf_parts, cls_parts = [], [], [], [], []
     for frame_index, result in enumerate(results):
         if result.boxes is None or result.boxes.id is None:
             continue
 
-        ids_tensor = result.boxes.id
-        
-        cls_tensor = result.boxes.cls
-        xyxy_tensor = result.boxes.xyxy
-        conf_tensor = result.boxes.conf
-
-        if ids_tensor is None:
-            continue
-        
-        ids = ids_tensor.int().cpu().numpy().tolist()
-        
-
-        for i, track_id in enumerate(ids):
-            class_id = int(cls_tensor[i].item()) if cls_tensor is not None else -1
-            class_name = result.names.get(class_id, str(class_id)) if hasattr(result, "names") else str(class_id)
-            xyxy = xyxy_tensor[i].cpu().numpy().tolist()
-            conf = float(conf_tensor[i].item()) if conf_tensor is not None else 0.0
-
-            # First time we see this track_id
-            if track_id not in unique_by_track:
-                timestamp_seconds = frame_index / fps if fps and fps > 0 else frame_index / 30.0
-
-                # Crop for first instance (so you still get an image reference)
-                crop_path = None
-                try:
-                    img = result.orig_img
-                    if img is not None:
-                        x1, y1, x2, y2 = [int(max(0, v)) for v in xyxy]
-                        h, w = img.shape[:2]
-                        x1 = max(0, min(x1, w - 1))
-                        x2 = max(0, min(x2, w))
-                        y1 = max(0, min(y1, h - 1))
-                        y2 = max(0, min(y2, h))
-                        if x2 > x1 and y2 > y1:
-                            filename = f"track_{track_id}_frame_{frame_index}_{uuid.uuid4().hex[:8]}.jpg"
-                            crop_path = os.path.join(custom_crop_dir, filename)
-                            crop_img = img[y1:y2, x1:x2]
-                            cv2.imwrite(crop_path, crop_img)
-                except Exception:
-                    crop_path = None
-
-                unique_by_track[track_id] = {
-                    "track_id": int(track_id),
-                    "type": class_name,
-                    "first_seen_timestamp": float(timestamp_seconds),
-                    "max_confidence": conf,
-                    "bbox_xyxy": [float(v) for v in xyxy],
-                    "crop_path": crop_path,
-                }
-            else:
-                # Update max confidence if higher
-                if conf > unique_by_track[track_id]["max_confidence"]:
-                    unique_by_track[track_id]["max_confidence"] = conf
-                    unique_by_track[track_id]["bbox_xyxy"] = [float(v) for v in xyxy]
-
-    # Return as list sorted by first_seen_timestamp
-    return sorted(unique_by_track.values(), key=lambda x: x["first_seen_timestamp"])
+        # One device-to-host copy per frame instead of a .cpu()/.item() per box
+        xyxy, ids, conf, cls = boxes_to_numpy(result)
+        frame_parts.append(np.full(len(ids), frame_index, dtype=np.int64))
+        xyxy_parts.append(xyxy)
+        id_parts.append(ids)
+        conf_parts.append(conf)
+        cls_parts.append(cls)
+
+    if not id_parts:
+        return []
+
+    frame_all = np.concatenate(frame_parts)
+    xyxy_all = np.concatenate(xyxy_parts)
+    ids_all = np.concatenate(id_parts)
+    conf_all = np.concatenate(conf_parts)
+    cls_all = np.concatenate(cls_parts)
+
+    # First row of each track (np.unique returns first occurrences), in order of appearance
+    _, first_rows = np.unique(ids_all, return_index=True)
+    first_rows.sort()
+    # Row of each track's max confidence: sort by (id, -conf); the stable sort keeps the earliest on ties
+    by_track = np.lexsort((-conf_all, ids_all))
+    _, group_starts = np.unique(ids_all[by_track], return_index=True)
+    best_row = dict(zip(ids_all[by_track[group_starts]].tolist(), by_track[group_starts].tolist()))
+
+    unique_tracks = []
+    for row in first_rows.tolist():
+        track_id = int(ids_all[row])
+        frame_index = int(frame_all[row])
+        class_id = int(cls_all[row])
+        class_name = class_names[class_id] if class_id < len(class_names) else str(class_id)
+        timestamp_seconds = frame_index / fps if fps and fps > 0 else frame_index / 30.0
+        best = best_row[track_id]
+
+        unique_tracks.append({
+            "track_id": track_id,
+            "type": class_name,
+            "first_seen_timestamp": float(timestamp_seconds),
+            "max_confidence": float(conf_all[best]),
+            "bbox_xyxy": xyxy_all[best].tolist(),
+            # Crop for first instance (so you still get an image reference)
+            "crop": _crop_first_instance(results[frame_index].orig_img, xyxy_all[row]),
+        })
+
+    # Already in first_seen_timestamp order
+    return unique_tracks
+
+def _crop_first_instance(img, xyxy):
+    """
+    Copy of the box's pixels (so the crop doesn't keep the whole frame alive),
+    or None; kept in memory and encoded once by the caller, never written here
+    """
+    try:
+        if img is None:
+            return None
+        x1, y1, x2, y2 = [int(max(0, v)) for v in xyxy]
+        h, w = img.shape[:2]
+        x1 = max(0, min(x1, w - 1))
+        x2 = max(0, min(x2, w))
+        y1 = max(0, min(y1, h - 1))
+        y2 = max(0, min(y2, h))
+        if x2 > x1 and y2 > y1:
+            return img[y1:y2, x1:x2].copy()
+    except Exception:
+        pass
+    return None
 
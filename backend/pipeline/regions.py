@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+
+# Box and blur primitives shared by the blurring pipeline and the offline
+# yolo-clean scripts. Imports nothing but OpenCV and NumPy and does no work at
+# import time (no numba, CUDA probing or environment changes), so it is safe
+# to load from anywhere.
+
+HAS_STACK_BLUR = hasattr(cv2, "stackBlur")  # OpenCV >= 4.7
+
+
+def clip_boxes(boxes, w, h):
+    """
+    Clip (N, 4) xyxy boxes to a w x h frame in two vectorised ops
+
+    YOLO boxes can poke a few pixels past the frame; a negative start would
+    otherwise wrap around when used as a slice index.
+    """
+    clipped = np.empty_like(boxes)
+    np.clip(boxes[:, 0::2], 0, w, out=clipped[:, 0::2])
+    np.clip(boxes[:, 1::2], 0, h, out=clipped[:, 1::2])
+    return clipped
+
+
+def merge_boxes(boxes, iou_thresh=0.3):
+    """
+    Merge (N, 4) xyxy boxes that overlap by more than iou_thresh into their union
+
+    Overlapping detections (several classes firing on one object) would
+    otherwise blur the same pixels more than once. Merged boxes can overlap
+    new ones, so passes repeat until nothing changes; N is small per frame.
+    """
+    if len(boxes) < 2:
+        return boxes
+    boxes = boxes.copy()
+    areas = np.prod(np.maximum(boxes[:, 2:] - boxes[:, :2], 0), axis=1).astype(np.float64)
+    alive = np.ones(len(boxes), dtype=bool)
+    changed = True
+    while changed:
+        changed = False
+        for i in np.flatnonzero(alive):
+            if not alive[i]:
+                continue
+            inter_wh = np.maximum(np.minimum(boxes[i, 2:], boxes[:, 2:]) - np.maximum(boxes[i, :2], boxes[:, :2]), 0)
+            inter = np.prod(inter_wh, axis=1)
+            iou = inter / np.maximum(areas[i] + areas - inter, 1)
+            hit = alive & (iou > iou_thresh)
+            hit[i] = False
+            if hit.any():
+                boxes[i, :2] = np.minimum(boxes[i, :2], boxes[hit, :2].min(axis=0))
+                boxes[i, 2:] = np.maximum(boxes[i, 2:], boxes[hit, 2:].max(axis=0))
+                areas[i] = np.prod(boxes[i, 2:] - boxes[i, :2])
+                alive[hit] = False
+                changed = True
+    return boxes[alive]
+
+
+def apply_blur(frame, box):
+    """ Apply Gaussian blur to region defined by box """
+    x1, y1, x2, y2 = box
+    roi = frame[y1:y2, x1:x2]
+    if roi.size > 0:
+        frame[y1:y2, x1:x2] = _gaussian_blur(roi)
+
+
+# GaussianBlur((51, 51), 30) is truncated at 51 taps, so its effective sigma is ~14.
+# Stack blur's kernel is a triangle (sigma ~ size / 4.9), so it needs 67 taps for the
+# same strength; a 51-tap stack blur would hide ~40% less variance
+GAUSSIAN_KSIZE = (51, 51)
+STACK_BLUR_KSIZE = (67, 67)
+
+
+def _gaussian_blur(roi):
+    """ Gaussian-strength blur (sigma ~14); stack blur is O(1) per pixel whatever the kernel size """
+    if HAS_STACK_BLUR:
+        return cv2.stackBlur(roi, STACK_BLUR_KSIZE)
+    return cv2.GaussianBlur(roi, GAUSSIAN_KSIZE, 30)
@@ -0,0 +1,63 @@
+import os
+import cv2
+
+# Optional forced hardware decoder for OpenCV's FFmpeg backend (e.g. "h264_cuvid" on NVIDIA hosts)
+VIDEO_HW_CODEC = os.environ.get("VIDEO_HW_CODEC")
+if VIDEO_HW_CODEC:
+    os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", f"video_codec;{VIDEO_HW_CODEC}")
+
+
+def open_video_capture(video_path):
+    """
+    Open a video, preferring hardware-accelerated decoding
+
+    Requests any available hardware decoder (NVDEC / VAAPI / VideoToolbox / D3D11)
+    from the FFmpeg backend. OpenCV drops back to software decoding when none is
+    present, so this is safe on CPU-only hosts.
+    """
+    if hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+        cap = cv2.VideoCapture(str(video_path), cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+        ])
+        if cap.isOpened():
+            return cap
+        cap.release()
+
+    # Older OpenCV builds or no FFmpeg backend: plain software decode
+    return cv2.VideoCapture(str(video_path))
+
+
+# Output codec for written videos; "avc1" (H.264) lets the FFmpeg backend pick NVENC/QSV/VAAPI
+VIDEO_WRITER_FOURCC = os.environ.get("VIDEO_WRITER_FOURCC", "mp4v")
+VIDEO_WRITER_FOURCC_CODE = cv2.VideoWriter_fourcc(*VIDEO_WRITER_FOURCC)
+
+
+def open_video_writer(video_path, fps, frame_size):
+    """
+    Open a VideoWriter, preferring hardware-accelerated encoding
+
+    Same fallback as open_video_capture(): when no hardware encoder exists for
+    VIDEO_WRITER_FOURCC (always the case for mp4v), a software writer is used.
+    """
+    video_path = str(video_path)
+    if hasattr(cv2, "VIDEOWRITER_PROP_HW_ACCELERATION"):
+        out = cv2.VideoWriter(video_path, cv2.CAP_FFMPEG, VIDEO_WRITER_FOURCC_CODE, fps, frame_size, [
+            cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+            cv2.VIDEOWRITER_PROP_IS_COLOR, 1,
+        ])
+        if out.isOpened():
+            return out
+        out.release()
+
+    return cv2.VideoWriter(video_path, VIDEO_WRITER_FOURCC_CODE, fps, frame_size, True)
+
+
+def capture_fps(cap):
+    """
+    Frame rate of an open capture as stored (29.97 stays 29.97); 0.0 when the container doesn't say
+
+    Not rounded: the writer must reproduce the source rate exactly or the output
+    drifts out of sync, and frame timestamps are more accurate with it too.
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    return float(fps) if fps and fps > 0 else 0.0
@@ -1,117 +1,166 @@
+import sys
+from pathlib import Path
 import cv2
+import numpy as np
 from collections import deque
+from itertools import chain
 
-# Store IDs that must always be blurred
-blurred_ids = set()
-blur_counters = {}  # {track_id: frames_remaining}
-BUFFER_FRAMES = 10  # temporal window before/after to blur
-
-def blur_video(results_data, output_video_path, conf_lvl):
-    """Take pre-computed detections and apply forward/backward blurring."""
-    global blurred_ids, blur_counters
-    blurred_ids.clear()
-    blur_counters.clear()
+# Box and blur primitives are shared with the API via backend/pipeline/regions.py,
+# which loads only OpenCV/NumPy (never the rest of the backend pipeline). Appended,
+# not prepended, so nothing in backend/ shadows this directory's modules
+sys.path.append(str(Path(__file__).resolve().parent.parent / "backend"))
+from pipeline.regions import apply_blur, clip_boxes, merge_boxes
 
-    # Get video props from first frame
-    h, w = results_data[0][0].shape[:2]
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video_path, fourcc, 30, (w, h))
+# Per-track-ID tables (ByteTrack IDs are small increasing ints); grown on demand
+blurred_lut = np.zeros(1024, dtype=bool)  # IDs that must always be blurred
+blur_counters = np.zeros(1024, dtype=np.int16)  # frames_remaining per ID
+BUFFER_FRAMES = 10  # temporal window before/after to blur
+_name_lut = (None, None)  # (names it was built from, names as an array indexed by class id)
+FOURCC_MP4V = cv2.VideoWriter_fourcc(*'mp4v')
+
+def video_fps(video_path, default=30):
+    """Frame rate stored in a video file, or default when the container doesn't say."""
+    cap = cv2.VideoCapture(str(video_path))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps and fps > 0 else default
+
+def blur_video(results_data, output_video_path, conf_lvl, fps=30):
+    """Take (frame, result) pairs (a list or detect_video's generator) and apply forward/backward blurring.
+
+    fps should be the source video's frame rate (see video_fps) so the output plays at the right speed.
+    """
+    blurred_lut[:] = False
+    blur_counters[:] = 0
+
+    # Get video props from first frame, then put it back in front of the rest
+    results_data = iter(results_data)
+    first = next(results_data, None)
+    if first is None:
+        raise ValueError("No frames to blur")
+    results_data = chain([first], results_data)
+    h, w = first[0].shape[:2]
+    out = cv2.VideoWriter(str(output_video_path), FOURCC_MP4V, fps, (w, h), True)
 
     frame_buffer = deque(maxlen=BUFFER_FRAMES)
 
     for frame, result in results_data:
-        # Add frame+result into buffer
-        frame_buffer.append([frame, result])
+        # Buffered frame: [frame, track_ids, boxes_xyxy, {track_id: (box, label)} to blur].
+        # Boxes are only collected here; each frame is blurred once, when written.
+        entry = [frame, np.empty(0, dtype=int), np.empty((0, 4), dtype=int), {}]
+        frame_buffer.append(entry)
 
         # Process detections & update IDs
-        new_ids = process_frame(frame, result, conf_lvl)
+        new_ids = process_frame(entry, result, conf_lvl)
 
         # Retro-blur if new IDs just activated
         if new_ids:
-            for past_frame, past_result in frame_buffer:
-                retro_blur(past_frame, past_result, new_ids)
+            for past_entry in frame_buffer:
+                retro_blur(past_entry, new_ids)
 
         # Decrement counters
         update_counters()
 
         # Write out oldest buffered frame
         if len(frame_buffer) == BUFFER_FRAMES:
-            oldest_frame, _ = frame_buffer.popleft()
-            out.write(oldest_frame)
+            write_frame(out, frame_buffer.popleft())
 
     # Flush remaining frames
     while frame_buffer:
-        oldest_frame, _ = frame_buffer.popleft()
-        out.write(oldest_frame)
+        write_frame(out, frame_buffer.popleft())
 
     out.release()
     print(f"Blurring complete. Output saved to: {output_video_path}")
 
 
-def process_frame(frame, result, conf_lvl):
-    """ Process detections in a single frame, return any newly activated IDs """
-    global blurred_ids, blur_counters
+def process_frame(entry, result, conf_lvl):
+    """ Record a buffered frame's detections and boxes to blur, return any newly activated IDs """
     new_ids = set()
 
-    boxes_xyxy = result.boxes.xyxy.cpu().numpy().astype(int)
-    confidences = result.boxes.conf.cpu().numpy()
-    class_ids = result.boxes.cls.cpu().numpy().astype(int)
-    names = [result.names[cls_id] for cls_id in class_ids]
-    track_ids = (
-        result.boxes.id.cpu().numpy().astype(int)
-        if result.boxes.id is not None else None
-    )
-
-    if track_ids is None:
+    if result.boxes.id is None:
         return new_ids
 
-    for i, box in enumerate(boxes_xyxy):
-        x1, y1, x2, y2 = box
-        track_id = track_ids[i]
-        conf = confidences[i]
+    # One device-to-host copy: [x1, y1, x2, y2, id, conf, cls] per tracked box
+    data = result.boxes.data.cpu().numpy()
+    boxes_xyxy = data[:, :4].astype(int)
+    track_ids = data[:, 4].astype(int)
+    confidences = data[:, 5]
+    class_ids = data[:, 6].astype(int)
+    entry[1], entry[2] = track_ids, boxes_xyxy
+
+    _ensure_capacity(int(track_ids.max()))
+
+    # If confidence passes threshold → activate blur
+    activate = np.unique(track_ids[(confidences >= conf_lvl) & ~blurred_lut[track_ids]])
+    blurred_lut[activate] = True
+    blur_counters[activate] = BUFFER_FRAMES
+    new_ids.update(activate.tolist())
+
+    # Blur if active (every counted ID is also set in blurred_lut)
+    keep = blurred_lut[track_ids]
+    if not keep.any():
+        return new_ids
+    names = _class_names(result.names)[class_ids[keep]]
+    pending = entry[3]
+    for box, track_id, conf, name in zip(boxes_xyxy[keep], track_ids[keep],
+                                         confidences[keep], names):
+        pending[int(track_id)] = (box, f"{name} {conf:.2f} ID:{track_id}")
 
-        # If confidence passes threshold → activate blur
-        if conf >= conf_lvl and track_id not in blurred_ids:
-            blurred_ids.add(track_id)
-            new_ids.add(track_id)
-            blur_counters[track_id] = BUFFER_FRAMES
+    return new_ids
 
-        # Blur if active or still in buffer
-        if track_id in blurred_ids or blur_counters.get(track_id, 0) > 0:
-            apply_blur(frame, box)
 
-            label = f"{names[i]} {conf:.2f} ID:{track_id}"
+def write_frame(out, entry):
+    """ Blur a buffered frame's pending boxes (once each), label them and write it """
+    frame, _, _, pending = entry
+    if not pending:
+        out.write(frame)
+        return
+    # Tracker boxes can poke past the frame; clip so edge regions aren't skipped
+    boxes = clip_boxes(np.array([box for box, _ in pending.values()]), frame.shape[1], frame.shape[0])
+    for box in merge_boxes(boxes):
+        apply_blur(frame, box)
+    # Labels after every blur, so an overlapping box never smears one
+    for (x1, y1, _, _), label in pending.values():
+        if label is not None:
             cv2.putText(frame, label, (x1, max(0, y1 - 10)),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-    return new_ids
+    out.write(frame)
 
 
-def retro_blur(frame, result, new_ids):
-    """ Retroactively blur new IDs in past buffered frames """
-    boxes_xyxy = result.boxes.xyxy.cpu().numpy().astype(int)
-    track_ids = (
-        result.boxes.id.cpu().numpy().astype(int)
-        if result.boxes.id is not None else None
-    )
-    if track_ids is None:
-        return
+def _class_names(names):
+    """ Memoized {class_id: name} -> object array, so a frame's labels are one fancy index
 
-    for i, box in enumerate(boxes_xyxy):
-        if track_ids[i] in new_ids:
-            apply_blur(frame, box)
+    Keyed on names, so a later blur_video call with another model's class map rebuilds it.
+    """
+    global _name_lut
+    cached_names, lut = _name_lut
+    if cached_names is not names and cached_names != names:
+        lut = np.array([names.get(i, str(i)) for i in range(max(names, default=-1) + 1)], dtype=object)
+        _name_lut = (names, lut)
+    return lut
 
 
-def apply_blur(frame, box):
-    """ Apply Gaussian blur to region defined by box """
-    x1, y1, x2, y2 = box
-    roi = frame[y1:y2, x1:x2]
-    if roi.size > 0:
-        blurred_roi = cv2.GaussianBlur(roi, (51, 51), 30)
-        frame[y1:y2, x1:x2] = blurred_roi
+def retro_blur(entry, new_ids):
+    """ Retroactively mark new IDs for blurring in a past buffered frame """
+    _, track_ids, boxes_xyxy, pending = entry
+    if not new_ids or len(track_ids) == 0:
+        return
+    selected = np.isin(track_ids, list(new_ids))
+    for track_id, box in zip(track_ids[selected].tolist(), boxes_xyxy[selected]):
+        pending.setdefault(track_id, (box, None))  # Keep a label already recorded this frame
 
 
 def update_counters():
-    global blur_counters
-    for tid in list(blur_counters.keys()):
-        blur_counters[tid] = max(0, blur_counters[tid] - 1)
+    np.maximum(blur_counters - 1, 0, out=blur_counters)
+
+
+def _ensure_capacity(max_id):
+    """ Grow the per-ID tables (doubling) so max_id is a valid index """
+    global blurred_lut, blur_counters
+    if max_id < len(blurred_lut):
+        return
+    size = len(blurred_lut)
+    while size <= max_id:
+        size *= 2
+    blurred_lut = np.concatenate([blurred_lut, np.zeros(size - len(blurred_lut), dtype=bool)])
+    blur_counters = np.concatenate([blur_counters, np.zeros(size - len(blur_counters), dtype=np.int16)])
@@ -1,5 +1,5 @@
 from detect import detect_video
-from blur import blur_video
+from blur import blur_video, video_fps
 
 def main():
     input_video = "input/Credit Card test 2.MOV"
@@ -7,7 +7,7 @@ def main():
     model_path = "models/best_detblur.pt"
 
     detections = detect_video(input_video, model_path)
-    blur_video(detections, output_video, conf_lvl=0.85)
+    blur_video(detections, output_video, conf_lvl=0.85, fps=video_fps(input_video))
 
 if __name__ == "__main__":
     main()